@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+#
+# Compares the size of the database and the insert throughput of the failures stored as
+# text, with the timestamp, issue, name and component repeated in every row of Failures
+# and its indexes, and stored with the ids of lookup tables and a single epoch time by
+# the database writer. The failures are pod restarts of 5000 pods in 100 namespaces,
+# written in batches of 1000 rows as the writer flushes them.
+#
+#   python benchmarks/database_size.py 1000000 10000000
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+import itertools
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cerberus.database.client as dbcli  # noqa: E402
+
+BATCH_SIZE = 1000
+
+
+def synthetic_failures(row_count):
+    random.seed(0)
+    start_time = int(time.time()) - row_count // 100
+    for i in range(row_count):
+        namespace = random.randrange(100)
+        yield (
+            start_time + i // 100,
+            random.randrange(1, 5),
+            "pod restart",
+            "openshift-namespace-%d-pod-%d-5d8f7c9b4-%05d" % (namespace, random.randrange(50), namespace),
+            "openshift-namespace-%d" % (namespace),
+        )
+
+
+def batches(row_count):
+    failures = synthetic_failures(row_count)
+    while True:
+        rows = list(itertools.islice(failures, BATCH_SIZE))
+        if not rows:
+            return
+        yield rows
+
+
+def text_rows(rows):
+    return [
+        (datetime.fromtimestamp(failure_time), failure_time, count, issue, name, component)
+        for failure_time, count, issue, name, component in rows
+    ]
+
+
+# The Failures table as it was before the lookup tables, with its indexes
+def write_text(connection, row_count):
+    connection.execute(
+        "create table Failures (timestamp timestamp, time integer, count integer, issue text, name text, "
+        "component text)"
+    )
+    connection.executescript(dbcli.migrations[0])
+    for rows in batches(row_count):
+        rows = text_rows(rows)
+        with connection:
+            connection.executemany("insert into Failures values (?, ?, ?, ?, ?, ?)", rows)
+
+
+def write_normalized(connection, row_count):
+    writer = dbcli.DatabaseWriter(dbcli.db_path)
+    for rows in batches(row_count):
+        writer.write(connection, rows)
+
+
+def measure(write, row_count):
+    with tempfile.TemporaryDirectory() as directory:
+        dbcli.set_db_path(os.path.join(directory, "cerberus.db"))
+        if write is write_normalized:
+            dbcli.create_db()
+            dbcli.create_table()
+        connection = sqlite3.connect(dbcli.db_path)
+        connection.execute("pragma journal_mode=wal")
+        connection.execute("pragma synchronous=normal")
+        start = time.time()
+        write(connection, row_count)
+        elapsed = time.time() - start
+        connection.execute("pragma wal_checkpoint(truncate)")
+        connection.close()
+        return os.path.getsize(dbcli.db_path), row_count / elapsed
+
+
+def main(row_counts):
+    print("%10s %-12s %12s %10s %12s" % ("rows", "schema", "MB", "bytes/row", "rows/s"))
+    for row_count in row_counts:
+        for schema, write in (("text", write_text), ("normalized", write_normalized)):
+            size, throughput = measure(write, row_count)
+            print(
+                "%10d %-12s %12.1f %10.1f %12.0f"
+                % (row_count, schema, size / 1024.0 / 1024.0, size / float(row_count), throughput)
+            )
+
+
+if __name__ == "__main__":
+    main([int(count) for count in sys.argv[1:]] or [1000000, 10000000])
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+#
+# Measures the history and analysis queries against a Failures table holding the given
+# number of rows spread over 30 days, read from the raw failures with the indexes on time,
+# (component, time) and (issue, time) and once they are dropped, and from the history
+# table the query is served from, the per minute and per hour rollups for the longer
+# ranges.
+#
+#   python benchmarks/history_queries.py 1000000 10000000
+
+import os
+import sys
+import time
+import random
+import itertools
+import sqlite3
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cerberus.database.client as dbcli  # noqa: E402
+
+DAYS = 30
+COMPONENTS = ["node", "cluster operator", "route"] + ["namespace-%d" % (i) for i in range(200)]
+ISSUES = ["not ready", "degraded", "pod crash", "pod restart", "unavailable"]
+SERIES = 2000
+
+
+# The failures of a set of failing pods, reported again at every iteration
+def synthetic_failures(row_count, finish_time):
+    random.seed(0)
+    series = [(random.choice(ISSUES), "pod-%d" % (i), random.choice(COMPONENTS)) for i in range(SERIES)]
+    start_time = finish_time - DAYS * 86400
+    for i in range(row_count):
+        failure_time = start_time + i * DAYS * 86400 // row_count
+        yield (failure_time, 1) + random.choice(series)
+
+
+def timed(command, params, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        rows = len(dbcli.fetch(command, params))
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rows
+
+
+def main(row_counts):
+    finish_time = int(time.time())
+    cases = [
+        ("history last hour", dict(start_time=finish_time - 3600, finish_time=finish_time)),
+        ("history last day", dict(start_time=finish_time - 86400, finish_time=finish_time)),
+        (
+            "analysis component, day",
+            dict(start_time=finish_time - 86400, finish_time=finish_time, component=("namespace-7",)),
+        ),
+        ("analysis issue, week", dict(start_time=finish_time - 7 * 86400, issue=("pod crash", "not ready"))),
+        ("analysis component, all", dict(component=("node", "route"))),
+    ]
+    dbcli.set_retention(raw=0, minute_rollup=0, hour_rollup=0)
+    print(
+        "%10s %-26s %8s %12s %12s %-16s %8s %10s"
+        % ("rows", "query", "results", "no index ms", "indexed ms", "served from", "results", "served ms")
+    )
+    for row_count in row_counts:
+        with tempfile.TemporaryDirectory() as directory:
+            dbcli.set_db_path(os.path.join(directory, "cerberus.db"))
+            dbcli.create_db()
+            dbcli.create_table()
+            writer = dbcli.DatabaseWriter(dbcli.db_path)
+            connection = sqlite3.connect(dbcli.db_path)
+            failures = synthetic_failures(row_count, finish_time)
+            while True:
+                rows = list(itertools.islice(failures, 100000))
+                if not rows:
+                    break
+                writer.write(connection, rows)
+            indexed = [timed(*dbcli.history_command(table="Failures", **filters)) for name, filters in cases]
+            served = [
+                (dbcli.history_table(filters.get("start_time"), filters.get("finish_time")),)
+                + timed(*dbcli.history_command(**filters))
+                for name, filters in cases
+            ]
+            for index in ("Failures_time", "Failures_component_time", "Failures_issue_time"):
+                connection.execute("drop index %s" % (index))
+            connection.close()
+            for (name, filters), (indexed_time, rows), (table, served_time, served_rows) in zip(cases, indexed, served):
+                no_index = timed(*dbcli.history_command(table="Failures", **filters))[0]
+                print(
+                    "%10d %-26s %8d %12.1f %12.1f %-16s %8d %10.1f"
+                    % (
+                        row_count,
+                        name,
+                        rows,
+                        no_index * 1000,
+                        indexed_time * 1000,
+                        table,
+                        served_rows,
+                        served_time * 1000,
+                    )
+                )
+
+
+if __name__ == "__main__":
+    main([int(count) for count in sys.argv[1:]] or [1000000, 10000000])
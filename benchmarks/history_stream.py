@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+#
+# Compares the peak memory and the time of serving the failures of the last hour over
+# http, streamed from the database cursor by the history endpoint, against fetching all
+# of them, writing them to a json file and reading the file back as the endpoint did.
+# The client reads the response 64KB at a time, the peak memory is traced in-process.
+#
+#   python benchmarks/history_stream.py 100000 1000000
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import tempfile
+import itertools
+import tracemalloc
+import http.client
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cerberus.database.client as dbcli  # noqa: E402
+import cerberus.server.server as server  # noqa: E402
+
+PORT = 18080
+
+
+def synthetic_failures(row_count, finish_time):
+    for i in range(row_count):
+        yield (
+            finish_time - 3000 + i * 3000 // row_count,
+            1,
+            "pod crash",
+            "pod-%d" % (i % 5000),
+            "namespace-%d" % (i % 50),
+        )
+
+
+# The history as it was served, every failure in memory and written to a json file which
+# is read back whole to be sent
+def served_from_file(directory):
+    finish_time = int(time.time())
+    rows = dbcli.fetch(*dbcli.history_command(finish_time - 3600, finish_time))
+    failures = []
+    for data in rows:
+        failures.append(
+            {"timestamp": data[0], "count": data[1], "issue": data[2], "name": data[3], "component": data[4]}
+        )
+    path = os.path.join(directory, "cerberus_history.json")
+    with open(path, "w+") as file:
+        json.dump({"history": {"failures": failures}}, file, indent=4, separators=(",", ": "))
+    with open(path, "rb") as file:
+        return len(file.read())
+
+
+def served_streaming(directory):
+    connection = http.client.HTTPConnection("127.0.0.1", PORT)
+    connection.request("GET", "/history")
+    response = connection.getresponse()
+    size = 0
+    while True:
+        data = response.read(65536)
+        if not data:
+            break
+        size += len(data)
+    connection.close()
+    return size
+
+
+# The time is measured on its own, tracing the allocations slows the serving down
+def measure(serve, directory):
+    start = time.time()
+    size = serve(directory)
+    elapsed = time.time() - start
+    tracemalloc.start()
+    serve(directory)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size, elapsed, peak
+
+
+def main(row_counts):
+    server.start_server(("127.0.0.1", PORT))
+    print("%10s %-10s %12s %10s %12s" % ("rows", "served", "bytes", "seconds", "peak MB"))
+    for row_count in row_counts:
+        with tempfile.TemporaryDirectory() as directory:
+            dbcli.set_db_path(os.path.join(directory, "cerberus.db"))
+            dbcli.create_db()
+            dbcli.create_table()
+            writer = dbcli.DatabaseWriter(dbcli.db_path)
+            connection = sqlite3.connect(dbcli.db_path)
+            failures = synthetic_failures(row_count, int(time.time()))
+            while True:
+                rows = list(itertools.islice(failures, 100000))
+                if not rows:
+                    break
+                writer.write(connection, rows)
+            connection.close()
+            for name, serve in (("file", served_from_file), ("streaming", served_streaming)):
+                size, elapsed, peak = measure(serve, directory)
+                print("%10d %-10s %12d %10.2f %12.1f" % (row_count, name, size, elapsed, peak / 1024.0 / 1024.0))
+
+
+if __name__ == "__main__":
+    main([int(count) for count in sys.argv[1:]] or [100000, 1000000])
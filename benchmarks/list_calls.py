@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+#
+# Measures the bytes on the wire and the decode time of the list calls of the namespace
+# validation and of the crash/restart tracker, fetching the full objects, their metadata
+# only or server side tables, with and without gzip, against the cluster of a kubeconfig.
+#
+#   python benchmarks/list_calls.py ~/.kube/config openshift-etcd openshift-apiserver
+
+import os
+import sys
+import gzip
+import json
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cerberus.kubernetes.client as kubecli  # noqa: E402
+from cerberus.kubernetes.records import pod_record, pod_table_record  # noqa: E402
+
+
+# Lists path in the given representation, returns the bytes received, the time spent
+# decompressing, decoding and projecting the pages and the number of records
+def measure(path, accept, transform, compression):
+    header_params = {"Accept": accept}
+    if compression:
+        header_params["Accept-Encoding"] = "gzip"
+    query_params = {"limit": kubecli.request_chunk_size}
+    if accept == kubecli.table_accept:
+        query_params["includeObject"] = "Metadata"
+    wire_bytes = 0
+    decode_time = 0
+    records = 0
+    while True:
+        response = kubecli.cli.api_client.call_api(
+            path,
+            "GET",
+            query_params=list(query_params.items()),
+            header_params=header_params,
+            auth_settings=["BearerToken"],
+            _preload_content=False,
+        )[0]
+        body = response.read(decode_content=False)
+        wire_bytes += len(body)
+        start = time.time()
+        if response.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        ret = json.loads(body)
+        if ret.get("kind") == "Table":
+            columns = [column["name"] for column in ret["columnDefinitions"]]
+            records += len(
+                [
+                    transform({"metadata": row["object"]["metadata"], "cells": dict(zip(columns, row["cells"]))})
+                    for row in ret["rows"]
+                ]
+            )
+        else:
+            records += len([transform(item) for item in ret["items"]])
+        decode_time += time.time() - start
+        query_params["continue"] = ret["metadata"].get("continue")
+        if not query_params["continue"]:
+            break
+    return wire_bytes, decode_time, records
+
+
+def main(kubeconfig_path, namespaces):
+    kubecli.initialize_clients(kubeconfig_path, 500, 60)
+    call_sites = [
+        ("namespaces", "/api/v1/namespaces", "application/json", lambda item: item["metadata"]["name"]),
+        (
+            "namespaces",
+            "/api/v1/namespaces",
+            kubecli.metadata_accept,
+            lambda item: item["metadata"]["name"],
+        ),
+    ]
+    for namespace in namespaces:
+        path = "/api/v1/namespaces/%s/pods" % (namespace)
+        call_sites.append(("pods " + namespace, path, "application/json", pod_record))
+        call_sites.append(("pods " + namespace, path, kubecli.table_accept, pod_table_record))
+    print("%-40s %-10s %-6s %8s %12s %10s" % ("call", "form", "gzip", "records", "wire bytes", "decode ms"))
+    for name, path, accept, transform in call_sites:
+        form = {kubecli.metadata_accept: "metadata", kubecli.table_accept: "table"}.get(accept, "full")
+        for compression in (False, True):
+            wire_bytes, decode_time, records = measure(path, accept, transform, compression)
+            print(
+                "%-40s %-10s %-6s %8d %12d %10.1f" % (name, form, compression, records, wire_bytes, decode_time * 1000)
+            )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: %s <kubeconfig> [namespace ...]" % (sys.argv[0]))
+        sys.exit(1)
+    main(os.path.expanduser(sys.argv[1]), sys.argv[2:] or ["kube-system"])
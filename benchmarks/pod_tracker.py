@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+#
+# Compares the pod tracker kept in a multiprocessing.Manager dict, read and written
+# one pod at a time by the pool workers, with the namespace state handed to the
+# workers and merged back in bulk by kubecli.namespace_sleep_tracker.
+#
+#   python benchmarks/pod_tracker.py 1000 10000 100000
+
+import os
+import sys
+import time
+import multiprocessing
+from itertools import repeat
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cerberus.kubernetes.client as kubecli  # noqa: E402
+from cerberus.kubernetes.records import PodRecord, ContainerRecord  # noqa: E402
+
+NAMESPACES = 20
+
+
+def synthetic_pods(pod_count, restarts):
+    pods = defaultdict(list)
+    for i in range(pod_count):
+        namespace = "namespace-%d" % (i % NAMESPACES)
+        pods[namespace].append(
+            PodRecord(
+                namespace,
+                "pod-%d" % i,
+                "uid-%d" % i,
+                "Running",
+                "2024-01-01T00:00:00Z",
+                (("Ready", "True"),),
+                (ContainerRecord("container", True, restarts if i % 100 == 0 else 0),),
+                (),
+                "ReplicaSet",
+            )
+        )
+    return pods
+
+
+# The tracker as it was: a Manager dict shared by all the workers
+def manager_tracker(namespace, pods_tracker, pods):
+    crashed_restarted_pods = defaultdict(list)
+    for pod_info in pods:
+        pod = pod_info.name
+        pod_restart_count = sum(container.restart_count for container in pod_info.containers)
+        if pod in pods_tracker:
+            if (
+                pods_tracker[pod]["creation_timestamp"] != pod_info.creation_timestamp
+                or pods_tracker[pod]["restart_count"] != pod_restart_count
+            ):
+                restarts = pod_restart_count - pods_tracker[pod]["restart_count"]
+                crashed_restarted_pods[namespace].append((pod, "restart", restarts))
+                pods_tracker[pod] = {
+                    "creation_timestamp": pod_info.creation_timestamp,
+                    "restart_count": pod_restart_count,
+                }
+        else:
+            crashed_restarted_pods[namespace].append((pod, "crash"))
+            pods_tracker[pod] = {"creation_timestamp": pod_info.creation_timestamp, "restart_count": pod_restart_count}
+    return crashed_restarted_pods
+
+
+def bench_manager(pool, manager, pods_by_pass):
+    pods_tracker = manager.dict()
+    timings = []
+    for pods in pods_by_pass:
+        start = time.time()
+        pool.starmap(manager_tracker, zip(pods.keys(), repeat(pods_tracker), pods.values()))
+        timings.append(time.time() - start)
+    return timings
+
+
+def bench_bulk(pool, pods_by_pass):
+    pods_tracker = {}
+    timings = []
+    for pods in pods_by_pass:
+        start = time.time()
+        namespaces = list(pods.keys())
+        tracker_outputs = pool.starmap(
+            kubecli.namespace_sleep_tracker,
+            zip(
+                namespaces,
+                [pods_tracker.get(namespace, {}) for namespace in namespaces],
+                pods.values(),
+            ),
+        )
+        kubecli.merge_tracker_updates(pods_tracker, namespaces, tracker_outputs)
+        timings.append(time.time() - start)
+    return timings
+
+
+def main(pod_counts):
+    multiprocessing.set_start_method("fork")
+    pool = multiprocessing.Pool(max(multiprocessing.cpu_count() // 2, 1))
+    manager = multiprocessing.Manager()
+    print("%10s %22s %22s" % ("pods", "manager dict seed/next", "bulk state seed/next"))
+    for pod_count in pod_counts:
+        # First pass seeds the tracker, the second one finds 1% of the pods restarted
+        pods_by_pass = [synthetic_pods(pod_count, 0), synthetic_pods(pod_count, 1)]
+        manager_timings = bench_manager(pool, manager, pods_by_pass)
+        bulk_timings = bench_bulk(pool, pods_by_pass)
+        print(
+            "%10d %10.3f / %9.3f %10.3f / %9.3f"
+            % (pod_count, manager_timings[0], manager_timings[1], bulk_timings[0], bulk_timings[1])
+        )
+    pool.close()
+    pool.join()
+
+
+if __name__ == "__main__":
+    main([int(count) for count in sys.argv[1:]] or [1000, 10000, 100000])
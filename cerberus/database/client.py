@@ -1,24 +1,262 @@
 import os
 import time
-import json
+import queue
+import atexit
+import logging
 import sqlite3
+import threading
 from datetime import datetime
 import cerberus.invoke.command as runcommand
 
+writer = None
+
+writer_queue_size = 10000
+
+writer_flush_interval = 1
+
+# Lookup tables of the values repeated across the failures, with their value column
+lookup_tables = {"Issues": "issue", "Names": "name", "Components": "component"}
+
+# Tables the history is served from, finest first, with their resolution in seconds, the
+# key of their retention and the longest range of time read from them
+history_tables = [
+    ("Failures", 0, "raw", 6 * 3600),
+    ("FailuresMinute", 60, "minute_rollup", 7 * 86400),
+    ("FailuresHour", 3600, "hour_rollup", None),
+]
+
+# Seconds the failures are kept in each of the history tables, 0 keeps them forever
+retention = {"raw": 604800, "minute_rollup": 2592000, "hour_rollup": 0}
+
+prune_interval = 3600
+
+# Columns ordering the failures of each history table along with their time, the values
+# of the last failure of a page are the cursor of the next one
+cursor_columns = {
+    "Failures": ("rowid",),
+    "FailuresMinute": ("component_id", "issue_id", "name_id"),
+    "FailuresHour": ("component_id", "issue_id", "name_id"),
+}
+
+
+# Writes the failures to the database from a background thread so that the monitoring
+# loop only hands the rows over. The thread keeps a single connection in WAL mode, so
+# that the history queries served over http read alongside it, and writes the queued
+# rows with executemany in one transaction per flush. The queue is bounded, the rows
+# which do not fit are dropped and counted instead of blocking the caller. The ids of
+# the issues, names and components are kept in memory once looked up, up to max_ids.
+# The counts of the per minute and per hour rollups are added to in the same transaction
+# and the failures past their retention are pruned every prune_interval seconds.
+class DatabaseWriter(object):
+    def __init__(self, path, queue_size=10000, flush_interval=1, batch_size=1000, max_ids=100000, prune_interval=0):
+        self.path = path
+        self.queue = queue.Queue(queue_size)
+        self.flush_interval = flush_interval
+        self.prune_interval = prune_interval
+        self.next_prune = 0
+        self.batch_size = batch_size
+        self.max_ids = max_ids
+        self.ids = {table: {} for table in lookup_tables}
+        self.dropped = 0
+        self.pid = os.getpid()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="cerberus-db-writer", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def put(self, rows):
+        for row in rows:
+            try:
+                self.queue.put_nowait(row)
+            except queue.Full:
+                self.dropped += 1
+
+    # Writes the rows queued so far and stops the thread
+    def stop(self):
+        self.stopped.set()
+        # Wake up the thread if it waits for rows
+        self.queue.put(None)
+        self.thread.join()
+
+    # Takes the queued rows, up to limit
+    def drain(self, rows, limit):
+        while len(rows) < limit:
+            try:
+                rows.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return [row for row in rows if row is not None]
+
+    # Id of the value in the lookup table, added to it when missing
+    def lookup(self, connection, table, value):
+        ids = self.ids[table]
+        value_id = ids.get(value)
+        if value_id is None:
+            column = lookup_tables[table]
+            connection.execute("insert or ignore into %s (%s) values (?)" % (table, column), (value,))
+            value_id = connection.execute("select id from %s where %s = ?" % (table, column), (value,)).fetchone()[0]
+            if len(ids) >= self.max_ids:
+                ids.clear()
+            ids[value] = value_id
+        return value_id
+
+    # Adds the counts of the failures to the rollups of their minute and hour
+    def rollup(self, connection, failures):
+        for table, resolution, key, max_range in history_tables[1:]:
+            counts = {}
+            for failure_time, count, issue_id, name_id, component_id in failures:
+                bucket = (failure_time - failure_time % resolution, component_id, issue_id, name_id)
+                counts[bucket] = counts.get(bucket, 0) + count
+            connection.executemany(
+                "insert into %s values (?, ?, ?, ?, ?) on conflict (time, component_id, issue_id, name_id) "
+                "do update set count = count + excluded.count" % (table),
+                [bucket + (count,) for bucket, count in counts.items()],
+            )
+
+    def write(self, connection, rows):
+        if rows:
+            try:
+                with connection:
+                    failures = [
+                        (
+                            time,
+                            count,
+                            self.lookup(connection, "Issues", issue),
+                            self.lookup(connection, "Names", name),
+                            self.lookup(connection, "Components", component),
+                        )
+                        for time, count, issue, name, component in rows
+                    ]
+                    connection.executemany("insert into Failures values (?, ?, ?, ?, ?)", failures)
+                    self.rollup(connection, failures)
+            except sqlite3.Error as e:
+                # The ids added in the transaction were rolled back with it
+                for ids in self.ids.values():
+                    ids.clear()
+                logging.error("Failed to store %s failures in the database: %s" % (len(rows), e))
+        if self.dropped:
+            logging.warning("Dropped %s failures which did not fit in the database queue" % (self.dropped))
+            self.dropped = 0
+
+    def run(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute("pragma journal_mode=wal")
+        connection.execute("pragma synchronous=normal")
+        while not self.stopped.is_set():
+            if self.prune_interval and time.time() >= self.next_prune:
+                self.next_prune = time.time() + self.prune_interval
+                try:
+                    prune(connection)
+                except sqlite3.Error as e:
+                    logging.error("Failed to prune the database: %s" % (e))
+            try:
+                rows = [self.queue.get(timeout=self.prune_interval or None)]
+            except queue.Empty:
+                continue
+            # Let the rows of the burst pile up before writing them together
+            self.stopped.wait(self.flush_interval)
+            self.write(connection, self.drain(rows, self.batch_size))
+        self.write(connection, self.drain([], float("inf")))
+        connection.close()
+
 
 def get_time(timestamp):
     return int(time.mktime(datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").timetuple()))
 
 
-def set_db_path(database_path):
+def set_db_path(database_path, queue_size=10000, flush_interval=1):
     global db_path
+    global writer_queue_size
+    global writer_flush_interval
     db_path = database_path
+    writer_queue_size = queue_size
+    writer_flush_interval = flush_interval
+
+
+def set_retention(raw=604800, minute_rollup=2592000, hour_rollup=0, interval=3600):
+    global prune_interval
+    retention.update({"raw": raw, "minute_rollup": minute_rollup, "hour_rollup": hour_rollup})
+    prune_interval = interval
+
+
+# Writer of the current process, started on the first insert so that the pool workers
+# forked before do not inherit its thread and connection
+def get_writer():
+    global writer
+    if writer is None or writer.pid != os.getpid():
+        writer = DatabaseWriter(db_path, writer_queue_size, writer_flush_interval, prune_interval=prune_interval)
+        writer.start()
+        atexit.register(writer.stop)
+    return writer
+
+
+# Drain the queued failures into the database and stop the writer
+def close():
+    global writer
+    if writer is not None and writer.pid == os.getpid():
+        writer.stop()
+        atexit.unregister(writer.stop)
+    writer = None
 
 
 def create_db():
     if os.path.isfile(db_path):
         runcommand.invoke("rm " + db_path)
-    sqlite3.connect(db_path)
+    sqlite3.connect(db_path).close()
+
+
+# Schema changes applied in order to the databases created by earlier versions, the
+# user_version of a database records how many of them it went through
+migrations = [
+    """create index if not exists Failures_time on Failures (time);
+       create index if not exists Failures_component_time on Failures (component, time);
+       create index if not exists Failures_issue_time on Failures (issue, time);""",
+    """create table Issues (id integer primary key, issue text unique);
+       create table Names (id integer primary key, name text unique);
+       create table Components (id integer primary key, component text unique);
+       insert into Issues (issue) select distinct issue from Failures;
+       insert into Names (name) select distinct name from Failures;
+       insert into Components (component) select distinct component from Failures;
+       alter table Failures rename to FailuresText;
+       create table Failures (
+           time integer,
+           count integer,
+           issue_id integer references Issues (id),
+           name_id integer references Names (id),
+           component_id integer references Components (id));
+       insert into Failures
+           select f.time, f.count, i.id, n.id, c.id from FailuresText f
+           join Issues i on i.issue = f.issue
+           join Names n on n.name = f.name
+           join Components c on c.component = f.component;
+       drop table FailuresText;
+       create index Failures_time on Failures (time);
+       create index Failures_component_time on Failures (component_id, time);
+       create index Failures_issue_time on Failures (issue_id, time);""",
+    """create table FailuresMinute (
+           time integer,
+           component_id integer,
+           issue_id integer,
+           name_id integer,
+           count integer,
+           primary key (time, component_id, issue_id, name_id)) without rowid;
+       create table FailuresHour (
+           time integer,
+           component_id integer,
+           issue_id integer,
+           name_id integer,
+           count integer,
+           primary key (time, component_id, issue_id, name_id)) without rowid;
+       create index FailuresMinute_component_time on FailuresMinute (component_id, time);
+       create index FailuresMinute_issue_time on FailuresMinute (issue_id, time);
+       create index FailuresHour_component_time on FailuresHour (component_id, time);
+       create index FailuresHour_issue_time on FailuresHour (issue_id, time);
+       insert into FailuresMinute
+           select time - time % 60, component_id, issue_id, name_id, sum(count) from Failures group by 1, 2, 3, 4;
+       insert into FailuresHour
+           select time - time % 3600, component_id, issue_id, name_id, sum(count) from Failures group by 1, 2, 3, 4;""",
+]
 
 
 def create_table():
@@ -33,34 +271,158 @@ def create_table():
                  component text);"""
     crsr.execute(command)
     connection.commit()
+    connection.close()
+    migrate(reused=False)
 
 
-def insert(timestamp, time, count, issue, names, component):
+# Prune the failures past their retention, when the database is reused
+def prune_db():
     connection = sqlite3.connect(db_path)
-    crsr = connection.cursor()
-    timestamp = timestamp.replace(microsecond=0)
+    try:
+        prune(connection)
+    finally:
+        connection.close()
+
+
+# Bring the database up to the current schema, building the indexes of a reused database
+# takes a while when it holds a large number of failures
+def migrate(reused=True):
+    connection = sqlite3.connect(db_path)
+    version = connection.execute("pragma user_version").fetchone()[0]
+    for index in range(version, len(migrations)):
+        if reused:
+            logging.info("Migrating the database to schema version %s" % (index + 1))
+        connection.executescript("begin; %s pragma user_version = %d; commit;" % (migrations[index], index + 1))
+    connection.close()
+
+
+# Queue the failures of the given components to be written by the database writer, only
+# the epoch time is stored, the timestamp of the history is derived from it
+def insert(timestamp, time, count, issue, names, component):
     time = int(time)
-    for name in names:
-        crsr.execute("insert into Failures values (?, ?, ?, ?, ?, ?)", (timestamp, time, count, issue, name, component))
-    connection.commit()
+    get_writer().put([(time, count, issue, name, component) for name in names])
+
+
+# Deletes the failures past their retention from the history tables
+def prune(connection):
+    now = int(time.time())
+    for table, resolution, key, max_range in history_tables:
+        if retention[key]:
+            with connection:
+                deleted = connection.execute(
+                    "delete from %s where time < ?" % (table), (now - retention[key],)
+                ).rowcount
+            if deleted:
+                logging.info("Pruned %s rows older than %s seconds from %s" % (deleted, retention[key], table))
+
+
+# The finest history table which still holds the failures from start_time and whose range
+# is not too long to be read from it, the longer ranges are served from the rollups with
+# the count of the failures of a component, issue and name summed per minute or per hour
+def history_table(start_time=None, finish_time=None):
+    now = int(time.time())
+    for table, resolution, key, max_range in history_tables:
+        if max_range is not None and (not start_time or (finish_time or now) - start_time > max_range):
+            continue
+        if retention[key] and (not start_time or start_time < now - retention[key]):
+            continue
+        return table
+    return history_tables[-1][0]
 
 
-def query(loopback):
+# The history table and the ordering values of the failure a cursor points to, raises a
+# ValueError when the cursor is not one returned with a page
+def parse_cursor(after):
+    values = [int(value) for value in after.split(".")]
+    if not 0 <= values[0] < len(history_tables) or len(values) != len(cursor_columns[history_tables[values[0]][0]]) + 2:
+        raise ValueError("Invalid cursor %s" % (after))
+    return history_tables[values[0]][0], values[1:]
+
+
+# Select statement of the failures in the time range with one of the given issues, names
+# and components, ordered by time and then by the cursor columns of the table, after the
+# given cursor values and up to limit, with its parameters
+def history_command(
+    start_time=None, finish_time=None, issue=(), name=(), component=(), table=None, after=None, limit=None
+):
+    table = table or history_table(start_time, finish_time)
+    columns = ["f.time"] + ["f.%s" % (column) for column in cursor_columns[table]]
+    conditions = []
+    params = []
+    if start_time:
+        conditions.append("f.time >= ?")
+        params.append(start_time)
+    if finish_time:
+        conditions.append("f.time <= ?")
+        params.append(finish_time)
+    for column, values in (("i.issue", issue), ("n.name", name), ("c.component", component)):
+        if values:
+            conditions.append("%s in (%s)" % (column, ", ".join("?" * len(values))))
+            params.extend(values)
+    if after:
+        conditions.append("(%s) > (%s)" % (", ".join(columns), ", ".join("?" * len(columns))))
+        params.extend(after)
+    command = (
+        "select datetime(f.time, 'unixepoch', 'localtime'), f.count, i.issue, n.name, c.component, %s from %s f "
+        "join Issues i on i.id = f.issue_id join Names n on n.id = f.name_id "
+        "join Components c on c.id = f.component_id" % (", ".join(columns), table)
+    )
+    if conditions:
+        command += " where " + " and ".join(conditions)
+    command += " order by " + ", ".join(columns)
+    if limit:
+        command += " limit ?"
+        params.append(limit)
+    return command, params
+
+
+def fetch(command, params):
     connection = sqlite3.connect(db_path)
-    crsr = connection.cursor()
+    try:
+        return connection.execute(command, params).fetchall()
+    finally:
+        connection.close()
+
+
+# Yields the failures matching the filters along with their cursor, read from the database
+# batch_size rows at a time. The failures of the next page are the ones after the cursor
+# of the last failure of a page, read from the history table of the first page.
+def history(
+    start_time=None, finish_time=None, issue=(), name=(), component=(), limit=None, after=None, batch_size=1000
+):
+    if after:
+        table, after = parse_cursor(after)
+    else:
+        table = history_table(start_time, finish_time)
+    index = [entry[0] for entry in history_tables].index(table)
+    command, params = history_command(start_time, finish_time, issue, name, component, table, after, limit)
+    connection = sqlite3.connect(db_path)
+    try:
+        crsr = connection.execute(command, params)
+        while True:
+            rows = crsr.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                failure = {
+                    "timestamp": row[0],
+                    "count": row[1],
+                    "issue": row[2],
+                    "name": row[3],
+                    "component": row[4],
+                }
+                yield failure, ".".join(str(value) for value in (index,) + row[5:])
+    finally:
+        connection.close()
+
+
+def query(loopback, limit=None, after=None):
     finish_time = int(time.time())
     start_time = finish_time - loopback
-    command = "select timestamp, count, issue, name, component from Failures where " "time >= " + str(
-        start_time
-    ) + " and time <= " + str(finish_time)
-    crsr.execute(command)
-    fetched_data = crsr.fetchall()
-    create_json(fetched_data, "cerberus_history.json")
+    return history(start_time, finish_time, limit=limit, after=after)
 
 
-def custom_query(filters):
-    connection = sqlite3.connect(db_path)
-    crsr = connection.cursor()
+def custom_query(filters, limit=None, after=None):
     start_time = ""
     finish_time = ""
     sdate = filters.get("sdate", "")
@@ -83,43 +445,4 @@ def custom_query(filters):
         finish_time = fdate + " " + ftime
         finish_time = get_time(finish_time)
 
-    command = "select timestamp, count, issue, name, component from Failures where "
-
-    if start_time and finish_time:
-        command += "time >= " + str(start_time) + " and time <= " + str(finish_time) + " and "
-    elif start_time:
-        command += "time >= " + str(start_time) + " and "
-    elif finish_time:
-        command += "time <= " + str(finish_time) + " and "
-
-    if issue:
-        command += "issue in " + str(issue + ("",)) + " and "
-    if name:
-        command += "name in " + str(name + ("",)) + " and "
-    if component:
-        command += "component in " + str(component + ("",)) + " and "
-
-    command = command.strip().rsplit(" ", 1)[0]
-
-    crsr.execute(command)
-    fetched_data = crsr.fetchall()
-
-    create_json(fetched_data, "cerberus_analysis.json")
-
-
-def create_json(fetched_data, file_name):
-    failures = []
-    for data in fetched_data:
-        failure = {
-            "timestamp": data[0],
-            "count": data[1],
-            "issue": data[2],
-            "name": data[3],
-            "component": data[4],
-        }
-        failures.append(failure)
-
-    history = {"history": {"failures": failures}}
-
-    with open("./history/" + file_name, "w+") as file:
-        json.dump(history, file, indent=4, separators=(",", ": "))
+    return history(start_time, finish_time, issue, name, component, limit=limit, after=after)
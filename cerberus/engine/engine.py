@@ -0,0 +1,23 @@
+from concurrent.futures import wait
+
+
+# Result of a concurrent.futures future with the interface of multiprocessing.pool.AsyncResult
+class AsyncResult(object):
+    def __init__(self, future):
+        self.future = future
+
+    def ready(self):
+        return self.future.done()
+
+    def wait(self, timeout=None):
+        wait([self.future], timeout)
+
+    def get(self, timeout=None):
+        return self.future.result(timeout)
+
+
+# Stands in for multiprocessing.Manager when the checks share the memory of the
+# main process, the containers it hands out are plain python objects
+class LocalManager(object):
+    def dict(self):
+        return {}
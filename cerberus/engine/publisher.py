@@ -0,0 +1,53 @@
+import logging
+import threading
+
+
+# Publishes the go/no-go signal as soon as one of its sources changes it. Each source,
+# the periodic checks or the watch events, sets its own status and the signal is the
+# conjunction of them. Updates are coalesced: the signal is recomputed at most once per
+# interval and only written out when it flips, so bursts of events do not turn into
+# bursts of writes. Nothing is published until each of the required sources set its
+# status once, so that a healthy signal is not published for a cluster not checked yet.
+class StatusPublisher(object):
+    def __init__(self, publish, interval=0.2, required=("checks",)):
+        self.publish = publish
+        self.interval = interval
+        self.required = set(required)
+        self.sources = {}
+        self.published = None
+        self.lock = threading.Lock()
+        self.changed = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.changed.set()
+
+    def set(self, source, healthy):
+        with self.lock:
+            self.sources[source] = healthy
+        self.changed.set()
+
+    # The signal, None while one of the required sources did not set its status yet
+    def status(self):
+        with self.lock:
+            if not self.required.issubset(self.sources):
+                return None
+            return all(self.sources.values())
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.changed.wait()
+            # Let the burst settle before publishing
+            self.stopped.wait(self.interval)
+            self.changed.clear()
+            status = self.status()
+            if status is not None and status != self.published:
+                logging.info("Publishing the cerberus status: %s" % (status))
+                self.publish(status)
+                self.published = status
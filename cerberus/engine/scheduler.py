@@ -0,0 +1,260 @@
+import time
+import random
+import logging
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from cerberus.engine.engine import AsyncResult
+
+
+def call(func):
+    return func()
+
+
+# A check run by the Scheduler. func is the function to run and status maps its result
+# to the go/no-go of the check. The keyword arguments named in state are passed the
+# values of the scheduler state when the check becomes due and, with previous set to a
+# keyword and an index, that keyword is passed the item at index of the latest result.
+# Checks with an interval of 0 run once per iteration, the others whenever their
+# interval plus a random jitter has elapsed and the manual ones only when asked to.
+# Local checks run in a thread of the main process instead of being handed to the pool.
+# The state of a check is healthy, failing or unknown (None) when its latest run missed
+# its deadline. The results of the runs which completed since the last report are kept
+# along with their state, up to max_results. completion_time and result_time are the
+# time the latest successful run completed and was submitted, a run which raised leaves
+# them and the result as they are and sets failed.
+class Check(object):
+    def __init__(
+        self,
+        name,
+        func,
+        status,
+        default=None,
+        interval=0,
+        jitter=0,
+        timeout=None,
+        local=False,
+        manual=False,
+        state=(),
+        previous=None,
+    ):
+        self.name = name
+        self.func = func
+        self.status = status
+        self.state = state
+        self.previous = previous
+        self.result = default
+        self.interval = interval
+        self.jitter = jitter
+        self.timeout = timeout
+        self.local = local
+        self.manual = manual
+        self.healthy = True
+        self.results = []
+        self.pending = None
+        self.submit_time = None
+        self.completion_time = None
+        self.result_time = None
+        self.failed = False
+        self.missed = False
+        self.misses = 0
+        self.next_run = 0
+
+
+# Runs every check at its own cadence on the given pool. The latest result of each check
+# is kept and the overall status is recomputed whenever one of them completes, on_change
+# is called when it flips. A check that is still running past its timeout, or past the
+# deadline of the iteration, is not waited for: its state becomes unknown until it
+# completes and the miss is counted. state holds the values which change between the
+# runs of the checks, such as the iteration, set by the caller and passed to the checks
+# naming them.
+class Scheduler(object):
+    def __init__(self, pool, tick=1, on_change=None, timeout=None, max_results=1000):
+        self.pool = pool
+        self.max_results = max_results
+        self.tick = tick
+        self.on_change = on_change
+        self.timeout = timeout
+        self.checks = {}
+        self.state = {}
+        self.local_executor = ThreadPoolExecutor(thread_name_prefix="cerberus-local-check")
+
+    def add(
+        self,
+        name,
+        func,
+        status,
+        default=None,
+        interval=0,
+        jitter=0,
+        timeout=None,
+        local=False,
+        manual=False,
+        state=(),
+        previous=None,
+    ):
+        if timeout is None:
+            timeout = self.timeout
+        self.checks[name] = Check(
+            name, func, status, default, interval, jitter, timeout, local, manual, state, previous
+        )
+
+    # Latest result of a check
+    def result(self, name):
+        return self.checks[name].result
+
+    # Time the run of the check which returned its latest result was submitted, None when
+    # no run completed yet
+    def result_time(self, name):
+        return self.checks[name].result_time
+
+    # State of a check, or whether none of the checks is failing. Checks in the unknown
+    # state do not fail the overall status, it is computed from the checks that completed.
+    def healthy(self, name=None):
+        if name is not None:
+            return self.checks[name].healthy
+        return all(check.healthy is not False for check in self.checks.values())
+
+    def unknown(self):
+        return [name for name, check in self.checks.items() if check.healthy is None]
+
+    # Number of times each check missed its deadline
+    def misses(self):
+        return {name: check.misses for name, check in self.checks.items() if check.misses}
+
+    # Whether the check completed since the results were last reported
+    def fresh(self, name):
+        return bool(self.checks[name].results)
+
+    # Results of the runs of the check which completed since the results were last
+    # reported, oldest first
+    def results(self, name):
+        return [result for result, healthy in self.checks[name].results]
+
+    # Results of the failing runs among them, so that a check which failed and recovered
+    # between two reports is reported as well
+    def failures(self, name):
+        return [result for result, healthy in self.checks[name].results if not healthy]
+
+    def reported(self):
+        for check in self.checks.values():
+            check.results = []
+
+    # The function of the check with its arguments from the state and its latest result
+    def build(self, check):
+        keywords = {name: self.state[name] for name in check.state}
+        if check.previous is not None:
+            keyword, index = check.previous
+            keywords[keyword] = check.result[index]
+        if not keywords:
+            return check.func
+        return functools.partial(check.func, **keywords)
+
+    def submit(self, check):
+        now = time.time()
+        check.next_run = now + check.interval + random.uniform(0, check.jitter)
+        check.submit_time = now
+        check.missed = False
+        if check.local:
+            check.pending = AsyncResult(self.local_executor.submit(call, self.build(check)))
+        else:
+            check.pending = self.pool.apply_async(call, (self.build(check),))
+
+    def complete(self, check, result, submit_time):
+        healthy = bool(check.status(result))
+        check.result = result
+        check.result_time = submit_time
+        check.completion_time = time.time()
+        check.failed = False
+        if len(check.results) >= self.max_results:
+            del check.results[0]
+        check.results.append((result, healthy))
+        self.update(check, healthy)
+
+    def fail(self, check, message):
+        logging.error(message)
+        check.failed = True
+        self.update(check, False)
+
+    def miss(self, check, deadline):
+        check.missed = True
+        check.misses += 1
+        logging.warning("Check %s did not complete within %.1f seconds" % (check.name, deadline - check.submit_time))
+        self.update(check, None)
+
+    def update(self, check, healthy):
+        overall = self.healthy()
+        if healthy != check.healthy:
+            state = {True: "healthy", False: "failing", None: "unknown"}[healthy]
+            logging.info("Check %s is %s" % (check.name, state))
+        check.healthy = healthy
+        if self.on_change is not None and self.healthy() != overall:
+            self.on_change(self.healthy())
+
+    # The time by which a check is expected to complete, the earliest of its timeout
+    # and the given deadline
+    def check_deadline(self, check, deadline):
+        if check.timeout is not None:
+            check_deadline = check.submit_time + check.timeout
+            if deadline is None or check_deadline < deadline:
+                return check_deadline
+        return deadline
+
+    # Collects the results of the checks that completed. With wait set, waits for the
+    # checks still running, each one at most until its deadline.
+    def collect(self, wait=False, deadline=None, checks=None):
+        for check in checks or list(self.checks.values()):
+            if check.pending is None:
+                continue
+            check_deadline = self.check_deadline(check, deadline)
+            if wait:
+                check.pending.wait(None if check_deadline is None else max(check_deadline - time.time(), 0))
+            if check.pending.ready():
+                pending, check.pending = check.pending, None
+                try:
+                    self.complete(check, pending.get(), check.submit_time)
+                except Exception as e:
+                    self.fail(check, "Exception in check %s: %s" % (check.name, e))
+            elif not check.missed and check_deadline is not None and time.time() >= check_deadline:
+                self.miss(check, check_deadline)
+
+    def due(self, check, iteration_start):
+        if check.pending is not None or check.manual:
+            return False
+        if check.interval == 0:
+            return iteration_start
+        return time.time() >= check.next_run
+
+    # Runs the checks due at the start of an iteration, including all the checks without
+    # an interval, and waits for them to complete until the given deadline
+    def run_iteration(self, deadline=None):
+        for check in self.checks.values():
+            if self.due(check, True):
+                self.submit(check)
+        self.collect(wait=True, deadline=deadline)
+
+    # Runs a manual check and waits for it until its timeout or the given deadline,
+    # returns whether it completed without raising. A run of the check still in progress
+    # is waited for instead of starting a new one.
+    def run(self, name, deadline=None):
+        check = self.checks[name]
+        start_time = time.time()
+        if check.pending is None:
+            self.submit(check)
+        self.collect(wait=True, deadline=deadline, checks=[check])
+        return check.completion_time is not None and check.completion_time >= start_time
+
+    # Keeps running the checks with an interval as they become due for the given duration
+    def run_for(self, duration):
+        deadline = time.time() + duration
+        while True:
+            for check in self.checks.values():
+                if self.due(check, False):
+                    self.submit(check)
+            self.collect()
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            time.sleep(min(self.tick, remaining))
+
+    def close(self):
+        self.local_executor.shutdown(wait=False)
@@ -0,0 +1,131 @@
+import math
+import time
+import logging
+import threading
+from kubernetes.client.rest import ApiException
+
+
+# Samples /livez and /readyz?verbose of the API server in a background thread, every
+# interval seconds, on a dedicated authenticated client whose connections are kept
+# alive between the probes. Every probe is recorded until the next call to collect so
+# that outages shorter than an iteration are reported by the iteration that follows.
+class ApiServerProber(object):
+    endpoints = (("livez", "/livez", []), ("readyz", "/readyz", [("verbose", "true")]))
+
+    def __init__(self, api_client, interval=5, timeout=5):
+        self.api_client = api_client
+        self.interval = interval
+        self.timeout = timeout
+        self.samples = []
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.sample()
+            self.stopped.wait(self.interval)
+
+    def sample(self):
+        samples = [self.probe(path, query_params) + (name,) for name, path, query_params in self.endpoints]
+        with self.lock:
+            self.samples.extend(samples)
+
+    # Returns the status, latency in seconds and failed internal checks of an endpoint.
+    # The verbose output lists each check of the API server as [+]name ok or [-]name failed.
+    def probe(self, path, query_params):
+        start_time = time.time()
+        try:
+            response = self.api_client.call_api(
+                path,
+                "GET",
+                query_params=query_params,
+                auth_settings=["BearerToken"],
+                _preload_content=False,
+                _request_timeout=self.timeout,
+            )
+            body = response[0].data.decode("utf-8")
+            healthy = True
+        except ApiException as e:
+            body = e.body.decode("utf-8") if isinstance(e.body, bytes) else e.body or ""
+            healthy = False
+            if not body:
+                body = "[-]%s failed: %s" % (path.strip("/"), e.reason)
+        except Exception as e:
+            body = "[-]%s failed: %s" % (path.strip("/"), e)
+            healthy = False
+        latency = time.time() - start_time
+        failed_checks = [line[3:].split(" ")[0] for line in body.splitlines() if line.startswith("[-]")]
+        return healthy, latency, failed_checks
+
+    # Returns the probes recorded since the previous call: whether all of them passed,
+    # the number of probes and failures, the failed checks and the latency percentiles.
+    # The API server is probed right away when nothing was recorded yet.
+    def collect(self):
+        with self.lock:
+            samples, self.samples = self.samples, []
+        if not samples:
+            self.sample()
+            with self.lock:
+                samples, self.samples = self.samples, []
+        failures = [sample for sample in samples if not sample[0]]
+        failed_checks = sorted(set("%s/%s" % (sample[3], check) for sample in failures for check in sample[2]))
+        report = build_report(len(samples), len(failures), failed_checks, [sample[1] for sample in samples])
+        return not failures, report
+
+
+def build_report(probes, failures, failed_checks, latencies):
+    latencies = sorted(latencies)
+    return {
+        "probes": probes,
+        "failures": failures,
+        "failed_checks": failed_checks,
+        "latencies": latencies,
+        "latency": {
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1],
+        },
+    }
+
+
+# Combines the reports of several collects, the percentiles are computed over all of
+# their probes
+def merge_reports(reports):
+    return build_report(
+        sum(report["probes"] for report in reports),
+        sum(report["failures"] for report in reports),
+        sorted(set(check for report in reports for check in report["failed_checks"])),
+        [latency for report in reports for latency in report["latencies"]],
+    )
+
+
+# Nearest rank percentile of a sorted list
+def percentile(values, rank):
+    return values[max(math.ceil(rank / 100.0 * len(values)) - 1, 0)]
+
+
+# Logs the report returned by ApiServerProber.collect
+def log_report(iteration, report):
+    logging.info(
+        "Iteration %s: Api Server probes: %s, failed: %s, latency p50: %.3fs p90: %.3fs p99: %.3fs max: %.3fs"
+        % (
+            iteration,
+            report["probes"],
+            report["failures"],
+            report["latency"]["p50"],
+            report["latency"]["p90"],
+            report["latency"]["p99"],
+            report["latency"]["max"],
+        )
+    )
+    if report["failed_checks"]:
+        logging.info("Iteration %s: Api Server failed checks: %s" % (iteration, ", ".join(report["failed_checks"])))
@@ -1,29 +1,80 @@
-import re
 import os
+import copy
 import sys
-import yaml
+import json
 import time
 import logging
 import requests
 import urllib3
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from kubernetes import client, config
-import cerberus.invoke.command as runcommand
 from kubernetes.client.rest import ApiException
+from cerberus.kubernetes.informer import Informer
+from cerberus.kubernetes.apiserver import ApiServerProber
+from cerberus.kubernetes.namespaces import NamespaceResolver
+from cerberus.kubernetes.filter import PodFilter
+from cerberus.kubernetes.records import (
+    pod_record,
+    node_record,
+    lease_record,
+    namespace_record,
+    event_record,
+    pod_table_record,
+    deployment_record,
+    statefulset_record,
+    daemonset_record,
+    csr_record,
+)
 
 pods_tracker = defaultdict(dict)
 
 kubeconfig_path_global = ""
 
+pod_informers = {}
+
+event_informers = {}
+
+namespace_informer = None
+
+csr_informer = None
+
+pod_filter = PodFilter()
+
+routes_session = None
+
+routes_session_pid = None
+
+pod_tracker_table = False
+
+# Accept headers asking for the server side Table and PartialObjectMetadataList forms of a
+# list, which leave out the spec and status of the objects. The apiservers which do not
+# serve them fall back to the full objects after the last comma.
+table_accept = (
+    "application/json;as=Table;v=v1;g=meta.k8s.io,application/json;as=Table;v=v1beta1;g=meta.k8s.io,application/json"
+)
+
+metadata_accept = (
+    "application/json;as=PartialObjectMetadataList;v=v1;g=meta.k8s.io,"
+    "application/json;as=PartialObjectMetadataList;v=v1beta1;g=meta.k8s.io,application/json"
+)
+
 
 # Load kubeconfig and initialize kubernetes python client
-def initialize_clients(kubeconfig_path, chunk_size, timeout):
+def initialize_clients(
+    kubeconfig_path, chunk_size, timeout, connection_pool_maxsize=None, compression=False, tracker_table=False
+):
     global cli
+    global custom_objects_cli
+    global certificates_cli
+    global coordination_cli
+    global apps_cli
     global api_client
     global client_config
     global request_chunk_size
     global cmd_timeout
     global kubeconfig_path_global
+    global pod_tracker_table
 
     """Initialize object and create clients from specified kubeconfig"""
     client_config = client.Configuration()
@@ -43,11 +94,23 @@ def initialize_clients(kubeconfig_path, chunk_size, timeout):
         if proxy_auth:
             client_config.proxy_headers = urllib3.util.make_headers(proxy_basic_auth=proxy_auth)
 
+    if connection_pool_maxsize:
+        client_config.connection_pool_maxsize = connection_pool_maxsize
+
     client.Configuration.set_default(client_config)
     cli = client.CoreV1Api()
+    custom_objects_cli = client.CustomObjectsApi()
+    certificates_cli = client.CertificatesV1Api()
+    coordination_cli = client.CoordinationV1Api()
+    apps_cli = client.AppsV1Api()
+    if compression:
+        # Let the apiserver gzip the large responses, urllib3 decompresses them
+        for api in (cli, custom_objects_cli, certificates_cli, coordination_cli, apps_cli):
+            api.api_client.set_default_header("Accept-Encoding", "gzip")
     cmd_timeout = timeout
     request_chunk_size = str(chunk_size)
     kubeconfig_path_global = kubeconfig_path
+    pod_tracker_table = tracker_table
     logging.info("client set")
 
 
@@ -69,16 +132,77 @@ def list_continue_helper(func, *args, **keyword_args):
     return ret_overall
 
 
+# Fast path of list_continue_helper for the large lists read on every iteration. The
+# kubernetes client models are skipped: each page is decoded once with json and its
+# items are projected into compact records through transform. With raise_errors set, a
+# failed call raises instead of returning the records listed so far.
+def list_continue_helper_raw(func, transform, *args, raise_errors=False, **keyword_args):
+    records = []
+    try:
+        while True:
+            ret = json.loads(func(*args, _preload_content=False, **keyword_args).data)
+            records.extend(transform(item) for item in ret["items"])
+            keyword_args["_continue"] = ret["metadata"].get("continue")
+            if not keyword_args["_continue"]:
+                break
+
+    except ApiException as e:
+        logging.error("Exception when calling CoreV1Api->%s: %s\n" % (str(func), e))
+        if raise_errors:
+            raise
+
+    return records
+
+
+# Lists the objects under the given api path in the representation negotiated through
+# accept, table_accept or metadata_accept, decoding each page once. The rows of a Table
+# are handed to transform as their metadata and a dict of their cells by column name,
+# the full objects sent by the apiservers without Table support as they are.
+def list_continue_helper_accept(path, transform, accept, raise_errors=False, **query_params):
+    records = []
+    query_params["limit"] = request_chunk_size
+    if accept == table_accept:
+        query_params["includeObject"] = "Metadata"
+    try:
+        while True:
+            response = cli.api_client.call_api(
+                path,
+                "GET",
+                query_params=list(query_params.items()),
+                header_params={"Accept": accept},
+                auth_settings=["BearerToken"],
+                _preload_content=False,
+                _request_timeout=cmd_timeout,
+            )
+            ret = json.loads(response[0].data)
+            if ret.get("kind") == "Table":
+                columns = [column["name"] for column in ret["columnDefinitions"]]
+                records.extend(
+                    transform({"metadata": row["object"]["metadata"], "cells": dict(zip(columns, row["cells"]))})
+                    for row in ret["rows"]
+                )
+            else:
+                records.extend(transform(item) for item in ret["items"])
+            query_params["continue"] = ret["metadata"].get("continue")
+            if not query_params["continue"]:
+                break
+
+    except ApiException as e:
+        logging.error("Exception when listing %s: %s\n" % (path, e))
+        if raise_errors:
+            raise
+
+    return records
+
+
 # List nodes in the cluster
 def list_nodes(label_selector=None):
     nodes = []
     try:
         if label_selector:
-            ret = list_continue_helper(
-                cli.list_node, pretty=True, label_selector=label_selector, limit=request_chunk_size
-            )
+            ret = list_continue_helper(cli.list_node, label_selector=label_selector, limit=request_chunk_size)
         else:
-            ret = list_continue_helper(cli.list_node, pretty=True, limit=request_chunk_size)
+            ret = list_continue_helper(cli.list_node, limit=request_chunk_size)
     except ApiException as e:
         logging.error("Exception when calling CoreV1Api->list_node: %s\n" % e)
 
@@ -91,12 +215,7 @@ def list_nodes(label_selector=None):
 
 # List all namespaces
 def list_namespaces():
-    namespaces = []
-    ret_overall = list_continue_helper(cli.list_namespace, pretty=True, limit=request_chunk_size)
-    for ret_items in ret_overall:
-        for namespace in ret_items.items:
-            namespaces.append(namespace.metadata.name)
-    return namespaces
+    return list_continue_helper_accept("/api/v1/namespaces", lambda item: item["metadata"]["name"], metadata_accept)
 
 
 # Monitor the status of all specified namespaces
@@ -107,7 +226,7 @@ def monitor_namespaces_status(watch_namespaces, watch_terminating_namespaces, it
     if watch_terminating_namespaces:
         watch_nodes_start_time = time.time()
         try:
-            ret = cli.list_namespace(pretty=True)
+            ret = cli.list_namespace()
         except ApiException as e:
             logging.error("Exception when calling CoreV1Api->list_namespace: %s\n" % e)
             sys.exit(1)
@@ -137,47 +256,243 @@ def get_node_info(node):
 # Get status of a pod in a namespace
 def get_pod_status(pod, namespace):
     try:
-        return cli.read_namespaced_pod_status(pod, namespace, pretty=True)
+        return cli.read_namespaced_pod_status(pod, namespace)
     except ApiException as e:
         logging.error("Exception when calling CoreV1Api->read_namespaced_pod_status: %s\n" % e)
 
 
-# Outputs a json blob with information about all the nodes
-def get_all_nodes_info():
-    try:
-        return list_continue_helper(cli.list_node, limit=request_chunk_size)
-    except ApiException as e:
-        logging.error("Exception when calling CoreV1Api->list_node: %s\n" % e)
+# Set the filter selecting the pods checked in the watched namespaces, before the pool
+# workers are forked so that each of them keeps the decisions of the passes it ran
+def set_pod_filter(filter):
+    global pod_filter
+    pod_filter = filter
 
 
-# Outputs a json blob with informataion about all pods in a given namespace
-def get_all_pod_info(namespace):
-    try:
-        ret = list_continue_helper(cli.list_namespaced_pod, namespace, pretty=True, limit=request_chunk_size)
-    except ApiException as e:
-        logging.error("Exception when calling CoreV1Api->list_namespaced_pod: %s\n" % e)
+# Outputs the records of all the nodes
+def get_all_nodes_info():
+    return list_continue_helper_raw(cli.list_node, node_record, limit=request_chunk_size)
+
+
+# Start the pod informers and wait for the initial list, one per namespace or a single
+# cluster wide one, indexed by namespace, so that the number of watches does not grow
+# with the number of watched namespaces. The pods of the other namespaces are handed to
+# the handler as well.
+def start_pod_informers(namespaces, sync_timeout, handler=None, cluster_wide=False):
+    informers = []
+    if cluster_wide:
+        if None not in pod_informers:
+            pod_informers[None] = Informer(
+                cli.list_pod_for_all_namespaces,
+                pod_record,
+                request_chunk_size,
+                request_timeout=cmd_timeout,
+                index=lambda pod_info: pod_info.namespace,
+                **pod_filter.list_args(),
+            )
+            informers.append(pod_informers[None])
+    else:
+        for namespace in namespaces:
+            if namespace not in pod_informers:
+                pod_informers[namespace] = Informer(
+                    cli.list_namespaced_pod,
+                    pod_record,
+                    request_chunk_size,
+                    request_timeout=cmd_timeout,
+                    namespace=namespace,
+                    **pod_filter.list_args(),
+                )
+                informers.append(pod_informers[namespace])
+    for informer in informers:
+        if handler is not None:
+            informer.add_handler(handler)
+        informer.start()
+    for informer in informers:
+        if not informer.wait_for_sync(sync_timeout):
+            logging.warning("Pod informer did not sync, falling back to list calls")
+
+
+# Pod informer caching the pods of a namespace, the cluster wide one if it is running,
+# and the key of the namespace in its cache
+def get_pod_informer(namespace):
+    if None in pod_informers:
+        return pod_informers[None], namespace
+    return pod_informers.get(namespace), None
+
+
+# Stop the pod and event informers of the namespaces which are no longer watched
+def stop_informers(namespaces):
+    for namespace in namespaces:
+        for informers in (pod_informers, event_informers):
+            informer = informers.pop(namespace, None)
+            if informer is not None:
+                informer.stop()
+
+
+# Start informers on the nodes and on the namespaces, the handlers are registered before
+# the initial list so that they see every object
+def start_node_informer(handler, sync_timeout):
+    return start_informer(cli.list_node, node_record, handler, sync_timeout)
+
+
+# A single namespace informer is shared by all of its handlers, the ones added once it
+# is running are handed the cached namespaces first
+def start_namespace_informer(handler, sync_timeout):
+    global namespace_informer
+    if namespace_informer is None:
+        namespace_informer = start_informer(cli.list_namespace, namespace_record, handler, sync_timeout)
+    else:
+        for namespace_info in namespace_informer.list():
+            handler("ADDED", namespace_info, None)
+        namespace_informer.add_handler(handler)
+    return namespace_informer
+
+
+# Start informers on the Warning events about pods, one per namespace or a single cluster
+# wide one. The handler is only registered once they synced so that it is not handed
+# the events which happened before cerberus started.
+def start_event_informers(namespaces, handler, sync_timeout, cluster_wide=False):
+    field_selector = "type=Warning,involvedObject.kind=Pod"
+    informers = []
+    if cluster_wide:
+        if None not in event_informers:
+            event_informers[None] = Informer(
+                cli.list_event_for_all_namespaces,
+                event_record,
+                request_chunk_size,
+                request_timeout=cmd_timeout,
+                field_selector=field_selector,
+            )
+            informers.append(event_informers[None])
+    else:
+        for namespace in namespaces:
+            if namespace not in event_informers:
+                event_informers[namespace] = Informer(
+                    cli.list_namespaced_event,
+                    event_record,
+                    request_chunk_size,
+                    request_timeout=cmd_timeout,
+                    namespace=namespace,
+                    field_selector=field_selector,
+                )
+                informers.append(event_informers[namespace])
+    for informer in informers:
+        informer.start()
+    for informer in informers:
+        if not informer.wait_for_sync(sync_timeout):
+            logging.warning("Event informer did not sync yet, events listed later are reported as new")
+        informer.add_handler(handler)
+    return informers
+
+
+# Start an informer on the CSR's, the CSR check reads its cache instead of listing them
+def start_csr_informer(sync_timeout):
+    global csr_informer
+    if csr_informer is None:
+        csr_informer = Informer(
+            certificates_cli.list_certificate_signing_request,
+            csr_record,
+            request_chunk_size,
+            request_timeout=cmd_timeout,
+        )
+        csr_informer.start()
+        if not csr_informer.wait_for_sync(sync_timeout):
+            logging.warning("CSR informer did not sync yet, falling back to list calls")
+    return csr_informer
+
+
+def start_informer(list_func, transform, handler, sync_timeout):
+    informer = Informer(list_func, transform, request_chunk_size, request_timeout=cmd_timeout)
+    informer.add_handler(handler)
+    informer.start()
+    if not informer.wait_for_sync(sync_timeout):
+        logging.warning("Informer for %s did not sync yet" % (list_func.__name__))
+    return informer
+
+
+# Start probing the API server in the background on a client of its own, so that the
+# probes keep their connections alive and do not share them with the checks. Failed
+# requests are not retried which would otherwise hide short outages.
+def start_apiserver_prober(interval, timeout):
+    prober_config = copy.deepcopy(client_config)
+    prober_config.retries = False
+    prober = ApiServerProber(client.ApiClient(prober_config), interval, timeout)
+    prober.start()
+    return prober
+
+
+# Outputs the records of all pods in a given namespace
+def get_all_pod_info(namespace, raise_errors=False):
+    informer, key = get_pod_informer(namespace)
+    if informer is not None:
+        if informer.fresh():
+            return informer.list(key)
+        logging.warning("Pod informer for %s is not in sync, listing the pods" % (namespace))
+    return list_continue_helper_raw(
+        cli.list_namespaced_pod,
+        pod_record,
+        namespace,
+        raise_errors=raise_errors,
+        limit=request_chunk_size,
+        **pod_filter.list_args(),
+    )
+
 
-    return ret
+# Outputs the records of all pods in a given namespace as read by the crash/restart
+# tracker. When they are not cached and pod_tracker_table is set, they are listed as a
+# server side Table holding only their metadata, status and restarts columns. The list
+# is complete or raises, as the pods missing from it are evicted from the tracker.
+def get_pod_tracker_info(namespace):
+    informer = get_pod_informer(namespace)[0]
+    if pod_tracker_table and (informer is None or not informer.fresh()):
+        selectors = pod_filter.list_args()
+        return list_continue_helper_accept(
+            "/api/v1/namespaces/%s/pods" % (namespace),
+            pod_table_record,
+            table_accept,
+            raise_errors=True,
+            labelSelector=selectors.get("label_selector", ""),
+            fieldSelector=selectors.get("field_selector", ""),
+        )
+    return get_all_pod_info(namespace, raise_errors=True)
+
+
+# Fetch the pods of all the given namespaces once so that the same listing can be
+# shared by the readiness and the crash/restart checks. A single cluster wide list
+# split by namespace replaces the per namespace lists when cluster_wide is set. With
+# raise_errors set, a failed list raises instead of leaving the snapshot incomplete.
+def get_pod_snapshot(namespaces, cluster_wide=False, raise_errors=False):
+    snapshot = {}
+    if cluster_wide and not pod_informers:
+        pods = defaultdict(list)
+        for pod in list_continue_helper_raw(
+            cli.list_pod_for_all_namespaces,
+            pod_record,
+            raise_errors=raise_errors,
+            limit=request_chunk_size,
+            **pod_filter.list_args(),
+        ):
+            pods[pod.namespace].append(pod)
+        for namespace in namespaces:
+            snapshot[namespace] = pods[namespace]
+    else:
+        for namespace in namespaces:
+            snapshot[namespace] = get_all_pod_info(namespace, raise_errors)
+    return snapshot
 
 
-# Check if all the watch_namespaces are valid
+# Check if all the watch_namespaces are valid, returns the resolver of the namespaces
+# they match
 def check_namespaces(namespaces):
     try:
         valid_namespaces = list_namespaces()
-        regex_namespaces = set(namespaces) - set(valid_namespaces)
-        final_namespaces = set(namespaces) - set(regex_namespaces)
-        valid_regex = set()
-        if regex_namespaces:
-            for namespace in valid_namespaces:
-                for regex_namespace in regex_namespaces:
-                    if re.search(regex_namespace, namespace):
-                        final_namespaces.add(namespace)
-                        valid_regex.add(regex_namespace)
-                        break
-        invalid_namespaces = regex_namespaces - valid_regex
+        resolver = NamespaceResolver(
+            set(namespaces) & set(valid_namespaces),
+            [namespace for namespace in namespaces if namespace not in valid_namespaces],
+        )
+        invalid_namespaces = resolver.resolve(valid_namespaces)
         if invalid_namespaces:
-            raise Exception("There exists no namespaces matching: %s" % (invalid_namespaces))
-        return list(final_namespaces)
+            raise Exception("There exists no namespaces matching: %s" % (set(invalid_namespaces)))
+        return resolver
     except Exception as e:
         logging.info("check namespaces error%s" % (e))
         sys.exit(1)
@@ -200,28 +515,112 @@ def check_sdn_namespace():
 # Monitor the status of the cluster nodes and set the status to true or false
 def monitor_nodes():
     notready_nodes = []
-    all_nodes_info_list = get_all_nodes_info()
-    for all_nodes_info in all_nodes_info_list:
-        for node_info in all_nodes_info.items:
-            node = node_info.metadata.name
-            node_kerneldeadlock_status = "False"
-            for condition in node_info.status.conditions:
-                if condition.type == "KernelDeadlock":
-                    node_kerneldeadlock_status = condition.status
-                elif condition.type == "Ready":
-                    node_ready_status = condition.status
-                else:
-                    continue
-            if node_kerneldeadlock_status != "False" or node_ready_status != "True":
-                notready_nodes.append(node)
+    for node_info in get_all_nodes_info():
+        if not is_node_ready(node_info):
+            notready_nodes.append(node_info.name)
     status = False if notready_nodes else True
     return status, notready_nodes
 
 
-def process_nodes(watch_nodes, iteration, iter_track_time):
+# Check the Ready and KernelDeadlock conditions of a node record
+def is_node_ready(node_info):
+    node_kerneldeadlock_status = "False"
+    node_ready_status = "Unknown"
+    for condition_type, condition_status in node_info.conditions:
+        if condition_type == "KernelDeadlock":
+            node_kerneldeadlock_status = condition_status
+        elif condition_type == "Ready":
+            node_ready_status = condition_status
+        else:
+            continue
+    return node_kerneldeadlock_status == "False" and node_ready_status == "True"
+
+
+# Get the record of a single node, None when it can't be read
+def get_node_record(node):
+    try:
+        return node_record(json.loads(cli.read_node_status(node, _preload_content=False).data))
+    except ApiException as e:
+        logging.error("Exception when calling CoreV1Api->read_node_status: %s\n" % e)
+
+
+# Monitor the nodes through the heartbeat leases the kubelets renew in kube-node-lease.
+# The full node conditions are read only for the nodes whose lease is stale, new or has
+# changed holder since the previous pass and for the nodes that were not ready then. A
+# node which turns not ready while its kubelet keeps renewing the lease is only noticed
+# through its conditions, so every conditions_refresh passes the nodes are all listed and
+# their conditions read again, 0 disables it. They are listed as well on the first pass
+# and when a node seen before has no lease, the nodes listed without a lease are treated
+# as having a stale one. node_tracker maps each node to its lease holder, transitions,
+# ready state and the number of passes since its conditions were read. Falls back to
+# monitor_nodes when the cluster has no node leases.
+def monitor_node_leases(node_tracker, conditions_refresh=0):
+    leases = {
+        lease.name: lease
+        for lease in list_continue_helper_raw(
+            coordination_cli.list_namespaced_lease, lease_record, "kube-node-lease", limit=request_chunk_size
+        )
+    }
+    if not leases:
+        logging.info("No node leases found in kube-node-lease, checking the node conditions")
+        status, notready_nodes = monitor_nodes()
+        return status, notready_nodes, {}
+    nodes_info = None
+    if (
+        not node_tracker
+        or any(node not in leases for node in node_tracker)
+        or (
+            conditions_refresh
+            and any(previous["passes"] + 1 >= conditions_refresh for previous in node_tracker.values())
+        )
+    ):
+        nodes_info = {node_info.name: node_info for node_info in get_all_nodes_info()}
+    nodes = list(leases)
+    if nodes_info is not None:
+        nodes.extend(node for node in nodes_info if node not in leases)
+    notready_nodes = []
+    current_nodes = {}
+    now = time.time()
+    for node in nodes:
+        lease = leases.get(node)
+        previous = node_tracker.get(node)
+        if nodes_info is not None:
+            node_info = nodes_info.get(node)
+            ready = node_info is not None and is_node_ready(node_info)
+            passes = 0
+        elif (
+            lease.renew_time is None
+            or now - lease.renew_time > (lease.duration or 40)
+            or previous is None
+            or not previous["ready"]
+            or previous["holder"] != lease.holder
+            or previous["transitions"] != lease.transitions
+        ):
+            node_info = get_node_record(node)
+            ready = node_info is not None and is_node_ready(node_info)
+            passes = 0
+        else:
+            ready = True
+            passes = previous["passes"] + 1
+        current_nodes[node] = {
+            "holder": lease.holder if lease is not None else None,
+            "transitions": lease.transitions if lease is not None else None,
+            "ready": ready,
+            "passes": passes,
+        }
+        if not ready:
+            notready_nodes.append(node)
+    status = False if notready_nodes else True
+    return status, notready_nodes, current_nodes
+
+
+def process_nodes(watch_nodes, iteration, iter_track_time, node_leases=False, node_tracker=None, conditions_refresh=0):
     if watch_nodes:
         watch_nodes_start_time = time.time()
-        watch_nodes_status, failed_nodes = monitor_nodes()
+        if node_leases:
+            watch_nodes_status, failed_nodes, node_tracker = monitor_node_leases(node_tracker or {}, conditions_refresh)
+        else:
+            watch_nodes_status, failed_nodes = monitor_nodes()
         iter_track_time["watch_nodes"] = time.time() - watch_nodes_start_time
         logging.info("Iteration %s: Node status: %s" % (iteration, watch_nodes_status))
     else:
@@ -230,97 +629,106 @@ def process_nodes(watch_nodes, iteration, iter_track_time):
         )
         watch_nodes_status = True
         failed_nodes = []
-    return watch_nodes_status, failed_nodes
+    return watch_nodes_status, failed_nodes, node_tracker
+
 
+# Restart count of a pod as the Restarts column of the server side Table of the pods
+# counts it, so that it is the same whichever way the pods were listed: the restarts of
+# its init containers while it is initializing, the ones of its containers once it is
+# initialized. The table records hold the column as a single container.
+def restart_count(pod_info):
+    if pod_info.init_containers and ("Initialized", "True") not in pod_info.conditions:
+        return sum(container.restart_count for container in pod_info.init_containers)
+    return sum(container.restart_count for container in pod_info.containers)
 
-# Track the pods that were crashed/restarted during the sleep interval of an iteration
-def namespace_sleep_tracker(namespace, pods_tracker, ignore_patterns):
+
+# Track the pods that were crashed/restarted during the sleep interval of an iteration.
+# pods_tracker holds the restart count of the pods of the namespace seen in the previous
+# pass by uid: a pod recreated under the same name has a new uid and is reported as
+# crashed. It is only read here, the entries to be updated and the uids of the pods
+# which are gone are returned so that the caller can merge them in a single step.
+def namespace_sleep_tracker(namespace, pods_tracker, pods=None):
     crashed_restarted_pods = defaultdict(list)
-    all_pod_info_list = get_all_pod_info(namespace)
-    if all_pod_info_list is not None and len(all_pod_info_list) > 0:
-        for all_pod_info in all_pod_info_list:
-            for pod_info in all_pod_info.items:
-                pod = pod_info.metadata.name
-                pod_status = pod_info.status
-                pod_status_phase = pod_status.phase
-                pod_restart_count = 0
-                match = False
-                if ignore_patterns:
-                    for pattern in ignore_patterns:
-                        if re.match(pattern, pod):
-                            match = True
-                if match:
-                    continue
-                if pod_status_phase != "Succeeded":
-                    pod_creation_timestamp = pod_info.metadata.creation_timestamp
-                    if pod_status.container_statuses is not None:
-                        for container in pod_status.container_statuses:
-                            pod_restart_count += container.restart_count
-                    if pod_status.init_container_statuses is not None:
-                        for container in pod_status.init_container_statuses:
-                            pod_restart_count += container.restart_count
-
-                    if pod in pods_tracker:
-                        if (
-                            pods_tracker[pod]["creation_timestamp"] != pod_creation_timestamp
-                            or pods_tracker[pod]["restart_count"] != pod_restart_count
-                        ):
-                            pod_restart_count = max(pod_restart_count, pods_tracker[pod]["restart_count"])
-                            if pods_tracker[pod]["creation_timestamp"] != pod_creation_timestamp:
-                                crashed_restarted_pods[namespace].append((pod, "crash"))
-                            if pods_tracker[pod]["restart_count"] != pod_restart_count:
-                                restarts = pod_restart_count - pods_tracker[pod]["restart_count"]
-                                crashed_restarted_pods[namespace].append((pod, "restart", restarts))
-                            pods_tracker[pod] = {
-                                "creation_timestamp": pod_creation_timestamp,
-                                "restart_count": pod_restart_count,
-                            }
-                    else:
-                        crashed_restarted_pods[namespace].append((pod, "crash"))
-                        if pod_restart_count != 0:
-                            crashed_restarted_pods[namespace].append((pod, "restart", pod_restart_count))
-                        pods_tracker[pod] = {
-                            "creation_timestamp": pod_creation_timestamp,
-                            "restart_count": pod_restart_count,
-                        }
+    tracker_updates = {}
+    if pods is None:
+        pods = get_pod_tracker_info(namespace)
+    seen = set()
+    for pod_info in pods:
+        if pod_filter.excluded(pod_info) or pod_info.phase == "Succeeded":
+            continue
+        pod = pod_info.name
+        uid = pod_info.uid or pod
+        seen.add(uid)
+        pod_restart_count = restart_count(pod_info)
+
+        previous_restart_count = pods_tracker.get(uid)
+        if previous_restart_count is None:
+            crashed_restarted_pods[namespace].append((pod, "crash"))
+            if pod_restart_count != 0:
+                crashed_restarted_pods[namespace].append((pod, "restart", pod_restart_count))
+            tracker_updates[uid] = pod_restart_count
+        elif pod_restart_count > previous_restart_count:
+            restarts = pod_restart_count - previous_restart_count
+            crashed_restarted_pods[namespace].append((pod, "restart", restarts))
+            tracker_updates[uid] = pod_restart_count
+        elif pod_restart_count < previous_restart_count:
+            # The count moves from the init containers to the containers once initialized
+            tracker_updates[uid] = pod_restart_count
+    evicted = [uid for uid in pods_tracker if uid not in seen]
+    return crashed_restarted_pods, tracker_updates, evicted
+
+
+# Merge the outputs of namespace_sleep_tracker into the tracker of each namespace
+def merge_tracker_updates(pods_tracker, namespaces, tracker_outputs):
+    crashed_restarted_pods = {}
+    for namespace, (crashed_restarted_namespace_pods, tracker_updates, evicted) in zip(namespaces, tracker_outputs):
+        # The first pass over a namespace seeds its state, its pods did not crash
+        if namespace in pods_tracker:
+            crashed_restarted_pods.update(crashed_restarted_namespace_pods)
+        namespace_tracker = pods_tracker.setdefault(namespace, {})
+        namespace_tracker.update(tracker_updates)
+        for uid in evicted:
+            namespace_tracker.pop(uid, None)
     return crashed_restarted_pods
 
 
+# Check a pod record, returns whether it is ready and its containers which are not
+def pod_readiness(pod_info):
+    ready = True
+    notready_containers = []
+    pod_status_phase = pod_info.phase
+    if pod_status_phase != "Running" and pod_status_phase != "Succeeded":
+        ready = False
+    if pod_status_phase != "Succeeded":
+        for condition_type, condition_status in pod_info.conditions:
+            if condition_type == "Ready" and condition_status == "False":
+                ready = False
+            if condition_type == "ContainersReady" and condition_status == "False":
+                for container in pod_info.containers:
+                    if not container.ready:
+                        notready_containers.append(container.name)
+                for container in pod_info.init_containers:
+                    if not container.ready:
+                        notready_containers.append(container.name)
+    return ready, notready_containers
+
+
 # Monitor the status of the pods in the specified namespace
 # and set the status to true or false
-def monitor_namespace(namespace, ignore_pattern=None):
+def monitor_namespace(namespace, pods=None):
     notready_pods = set()
-    match = False
     notready_containers = defaultdict(list)
-    all_pod_info_list = get_all_pod_info(namespace)
-    if all_pod_info_list is not None and len(all_pod_info_list) > 0:
-        for all_pod_info in all_pod_info_list:
-            for pod_info in all_pod_info.items:
-                pod = pod_info.metadata.name
-                if ignore_pattern:
-                    for pattern in ignore_pattern:
-                        if re.match(pattern, pod):
-                            match = True
-                if match:
-                    continue
-                pod_status = pod_info.status
-                pod_status_phase = pod_status.phase
-                if pod_status_phase != "Running" and pod_status_phase != "Succeeded":
-                    notready_pods.add(pod)
-                if pod_status_phase != "Succeeded":
-                    if pod_status.conditions is not None:
-                        for condition in pod_status.conditions:
-                            if condition.type == "Ready" and condition.status == "False":
-                                notready_pods.add(pod)
-                            if condition.type == "ContainersReady" and condition.status == "False":
-                                if pod_status.container_statuses is not None:
-                                    for container in pod_status.container_statuses:
-                                        if not container.ready:
-                                            notready_containers[pod].append(container.name)
-                                if pod_status.init_container_statuses is not None:
-                                    for container in pod_status.init_container_statuses:
-                                        if not container.ready:
-                                            notready_containers[pod].append(container.name)
+    if pods is None:
+        pods = get_all_pod_info(namespace)
+    for pod_info in pods:
+        pod = pod_info.name
+        if pod_filter.excluded(pod_info):
+            continue
+        pod_ready, pod_notready_containers = pod_readiness(pod_info)
+        if not pod_ready:
+            notready_pods.add(pod)
+        if pod_notready_containers:
+            notready_containers[pod].extend(pod_notready_containers)
     notready_pods = list(notready_pods)
     if notready_pods or notready_containers:
         status = False
@@ -329,19 +737,156 @@ def monitor_namespace(namespace, ignore_pattern=None):
     return status, notready_pods, notready_containers
 
 
-def process_namespace(iteration, namespace, failed_pods_components, failed_pod_containers, ignore_pattern):
-    watch_component_status, failed_component_pods, failed_containers = monitor_namespace(namespace, ignore_pattern)
+def process_namespace(iteration, namespace, failed_pods_components, failed_pod_containers, pods=None):
+    watch_component_status, failed_component_pods, failed_containers = monitor_namespace(namespace, pods)
     logging.info("Iteration %s: %s: %s" % (iteration, namespace, watch_component_status))
     if not watch_component_status:
         failed_pods_components[namespace] = failed_component_pods
         failed_pod_containers[namespace] = failed_containers
 
 
-# Get cluster operators and return yaml
+# Outputs the records of the deployments, statefulsets and daemonsets in a given namespace
+def get_all_workload_info(namespace):
+    workloads = []
+    for list_func, transform in (
+        (apps_cli.list_namespaced_deployment, deployment_record),
+        (apps_cli.list_namespaced_stateful_set, statefulset_record),
+        (apps_cli.list_namespaced_daemon_set, daemonset_record),
+    ):
+        workloads.extend(list_continue_helper_raw(list_func, transform, namespace, limit=request_chunk_size))
+    return workloads
+
+
+# Fetch the workloads of all the given namespaces once, through a single cluster wide
+# list of each kind split by namespace when cluster_wide is set
+def get_workload_snapshot(namespaces, cluster_wide=False):
+    snapshot = {}
+    if cluster_wide:
+        workloads = defaultdict(list)
+        for list_func, transform in (
+            (apps_cli.list_deployment_for_all_namespaces, deployment_record),
+            (apps_cli.list_stateful_set_for_all_namespaces, statefulset_record),
+            (apps_cli.list_daemon_set_for_all_namespaces, daemonset_record),
+        ):
+            for workload in list_continue_helper_raw(list_func, transform, limit=request_chunk_size):
+                workloads[workload.namespace].append(workload)
+        for namespace in namespaces:
+            snapshot[namespace] = workloads[namespace]
+    else:
+        for namespace in namespaces:
+            snapshot[namespace] = get_all_workload_info(namespace)
+    return snapshot
+
+
+# Kind of the controller of the pods of each of the workloads checked by monitor_workloads
+workload_pod_owner_kinds = {"Deployment": "ReplicaSet", "StatefulSet": "StatefulSet", "DaemonSet": "DaemonSet"}
+
+
+# Outputs the records of the pods of a namespace which are not owned by one of the
+# workloads, such as the static pods mirrored by the kubelets or the bare pods. They are
+# picked from the metadata of the pods and only those are read in full, unless the pods
+# are cached. The pods left out by the pod filter are not returned.
+def get_bare_pod_info(namespace):
+    informer, key = get_pod_informer(namespace)
+    if informer is not None and informer.fresh():
+        pods = informer.list(key)
+    else:
+        selectors = pod_filter.list_args()
+        pods = list_continue_helper_accept(
+            "/api/v1/namespaces/%s/pods" % (namespace),
+            pod_record,
+            metadata_accept,
+            labelSelector=selectors.get("label_selector", ""),
+            fieldSelector=selectors.get("field_selector", ""),
+        )
+    bare_pods = []
+    for pod_info in pods:
+        if pod_info.owner_kind in workload_pod_owner_kinds.values() or pod_filter.excluded(pod_info):
+            continue
+        if pod_info.phase is None:
+            try:
+                pod_info = pod_record(
+                    json.loads(cli.read_namespaced_pod_status(pod_info.name, namespace, _preload_content=False).data)
+                )
+            except ApiException as e:
+                if e.status != 404:
+                    logging.error("Exception when calling CoreV1Api->read_namespaced_pod_status: %s\n" % e)
+                continue
+        bare_pods.append(pod_info)
+    return bare_pods
+
+
+# Monitor the deployments, statefulsets and daemonsets of the specified namespace: a
+# workload is degraded when fewer of its replicas are ready than desired. The pods are
+# only listed for the degraded workloads, to report which of their pods and containers
+# are not ready. The workloads whose pods are owned by one of the ignored owner kinds are
+# not checked and the pod name patterns are matched against the pods only, a degraded
+# workload whose pods are all left out by them is not reported. The pods which are not
+# owned by one of the workloads are checked one by one.
+def monitor_workloads(namespace, workloads=None):
+    failed_workloads = []
+    notready_containers = defaultdict(list)
+    if workloads is None:
+        workloads = get_all_workload_info(namespace)
+    for workload in workloads:
+        if workload.ready >= workload.desired:
+            continue
+        if workload_pod_owner_kinds[workload.kind] in pod_filter.ignore_owner_kinds:
+            continue
+        pods = []
+        if workload.selector:
+            pods = list_continue_helper_raw(
+                cli.list_namespaced_pod,
+                pod_record,
+                namespace,
+                limit=request_chunk_size,
+                **pod_filter.list_args(workload.selector),
+            )
+        checked_pods = [pod_info for pod_info in pods if not pod_filter.excluded(pod_info)]
+        if pods and not checked_pods:
+            continue
+        failed_workloads.append("%s/%s" % (workload.kind.lower(), workload.name))
+        for pod_info in checked_pods:
+            pod_ready, pod_notready_containers = pod_readiness(pod_info)
+            if pod_notready_containers:
+                notready_containers[pod_info.name].extend(pod_notready_containers)
+            elif not pod_ready:
+                notready_containers[pod_info.name] = []
+    for pod_info in get_bare_pod_info(namespace):
+        pod_ready, pod_notready_containers = pod_readiness(pod_info)
+        if not pod_ready or pod_notready_containers:
+            failed_workloads.append("pod/%s" % (pod_info.name))
+            notready_containers[pod_info.name].extend(pod_notready_containers)
+    return not failed_workloads, failed_workloads, notready_containers
+
+
+def process_workloads(iteration, namespace, failed_workloads_components, failed_pod_containers, workloads=None):
+    watch_component_status, failed_workloads, failed_containers = monitor_workloads(namespace, workloads)
+    logging.info("Iteration %s: %s: %s" % (iteration, namespace, watch_component_status))
+    if not watch_component_status:
+        failed_workloads_components[namespace] = failed_workloads
+        failed_pod_containers[namespace] = failed_containers
+
+
+# Get cluster operators keeping only their name and Degraded condition
 def get_cluster_operators():
-    operators_status = runcommand.invoke("kubectl get co -o yaml --kubeconfig " + kubeconfig_path_global, cmd_timeout)
-    status_yaml = yaml.load(operators_status, Loader=yaml.FullLoader)
-    return status_yaml
+    try:
+        ret = custom_objects_cli.list_cluster_custom_object(
+            "config.openshift.io", "v1", "clusteroperators", _request_timeout=cmd_timeout
+        )
+    except ApiException as e:
+        logging.error("Exception when calling CustomObjectsApi->list_cluster_custom_object: %s\n" % e)
+        raise
+    cluster_operators = {"items": []}
+    for operator in ret["items"]:
+        cluster_operator = {"metadata": {"name": operator["metadata"]["name"]}}
+        status = operator.get("status") or {}
+        if "conditions" in status:
+            cluster_operator["status"] = {
+                "conditions": [condition for condition in status["conditions"] if condition["type"] == "Degraded"]
+            }
+        cluster_operators["items"].append(cluster_operator)
+    return cluster_operators
 
 
 # Monitor cluster operators
@@ -366,8 +911,8 @@ def monitor_cluster_operator(cluster_operators):
 def process_cluster_operator(distribution, watch_cluster_operators, iteration, iter_track_time):
     if distribution == "openshift" and watch_cluster_operators:
         watch_co_start_time = time.time()
-        status_yaml = get_cluster_operators()
-        watch_cluster_operators_status, failed_operators = monitor_cluster_operator(status_yaml)
+        cluster_operators = get_cluster_operators()
+        watch_cluster_operators_status, failed_operators = monitor_cluster_operator(cluster_operators)
         iter_track_time["watch_cluster_operators"] = time.time() - watch_co_start_time
         logging.info("Iteration %s: Cluster Operator status: %s" % (iteration, watch_cluster_operators_status))
     else:
@@ -377,36 +922,33 @@ def process_cluster_operator(distribution, watch_cluster_operators, iteration, i
 
 
 # Check for NoSchedule taint in all the master nodes
-def check_master_taint(master_nodes, master_label):
+# The master nodes are fetched with a single list call filtered by the master label, so
+# the returned list of master nodes also reflects the control plane nodes that were replaced
+def check_master_taint(master_label):
     schedulable_masters = []
+    master_nodes = []
+    for node_info in list_continue_helper_raw(
+        cli.list_node, node_record, label_selector=master_label, limit=request_chunk_size
+    ):
+        master_nodes.append(node_info.name)
+        if (str(master_label), "NoSchedule") not in node_info.taints:
+            schedulable_masters.append(node_info.name)
+    return schedulable_masters, master_nodes
 
-    for master_node in master_nodes:
-        node_info = get_node_info(master_node)
-        node = node_info.metadata.name
-        NoSchedule_taint = False
-        try:
-            if node_info.spec is not None:
-                if node_info.spec.taints is not None:
-                    for taint in node_info.spec.taints:
-                        if taint.key == str(master_label) and taint.effect == "NoSchedule":
-                            NoSchedule_taint = True
-                            break
-                    if not NoSchedule_taint:
-                        schedulable_masters.append(node)
-        except Exception as e:
-            logging.info("Exception getting master nodes" + str(e))
-            schedulable_masters.append(node)
-    return schedulable_masters
-
-
-def process_master_taint(master_nodes, master_label, iteration, iter_track_time):
+
+def process_master_taint(master_nodes, master_label, iteration, iter_track_time, check_interval=10):
     schedulable_masters = []
     if len(master_nodes) > 0:
-        if iteration % 10 == 1:
+        if (iteration - 1) % check_interval == 0:
             check_taint_start_time = time.time()
-            schedulable_masters = check_master_taint(master_nodes, master_label)
+            schedulable_masters, current_master_nodes = check_master_taint(master_label)
+            if not current_master_nodes:
+                logging.warning("No master node found for the label %s, keeping the previous list" % (master_label))
+            elif set(current_master_nodes) != set(master_nodes):
+                logging.info("Master nodes changed from %s to %s" % (master_nodes, current_master_nodes))
+                master_nodes = current_master_nodes
             iter_track_time["check_master_taint"] = time.time() - check_taint_start_time
-    return schedulable_masters
+    return schedulable_masters, master_nodes
 
 
 # See if url is available
@@ -421,27 +963,111 @@ def is_url_available(url, header=None):
         return False
 
 
-def process_routes(watch_url_routes, iter_track_time):
+# Returns the session used for the route checks. Connections are kept alive in a pool
+# per host which is sized for the number of concurrent checks, the session is created
+# again in a forked worker rather than sharing the sockets of the parent process.
+def get_routes_session(concurrency):
+    global routes_session
+    global routes_session_pid
+    if routes_session is None or routes_session_pid != os.getpid():
+        routes_session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        routes_session.mount("http://", adapter)
+        routes_session.mount("https://", adapter)
+        routes_session_pid = os.getpid()
+    return routes_session
+
+
+# Route entries are either a list with the url and an optional authorization parameter
+# or a dict with the url, authorization and per route timeouts and latency threshold
+def route_settings(route_info, connect_timeout, read_timeout, latency_threshold):
+    if isinstance(route_info, dict):
+        return (
+            route_info["url"],
+            route_info.get("authorization"),
+            route_info.get("connect_timeout", connect_timeout),
+            route_info.get("read_timeout", read_timeout),
+            route_info.get("latency_threshold", latency_threshold),
+        )
+    return (
+        route_info[0],
+        route_info[1] if len(route_info) > 1 else None,
+        connect_timeout,
+        read_timeout,
+        latency_threshold,
+    )
+
+
+# Check a route and return its url, status and latency in seconds. The route fails when
+# the response is not a 200 or, if a latency threshold is set, takes longer than it.
+def check_route(session, url, authorization, connect_timeout, read_timeout, latency_threshold):
+    # Might need to get different authorization types here
+    header = {"Accept": "application/json"}
+    if authorization:
+        header["Authorization"] = authorization
+    start_time = time.time()
+    try:
+        response = session.get(url, headers=header, verify=False, timeout=(connect_timeout, read_timeout))
+        latency = time.time() - start_time
+        if response.status_code != 200:
+            logging.info("Route %s returned status code %s" % (url, response.status_code))
+            return url, False, latency
+    except Exception as e:
+        latency = time.time() - start_time
+        logging.info("Route %s is not available: %s" % (url, e))
+        return url, False, latency
+    if latency_threshold and latency > latency_threshold:
+        logging.info("Route %s took %.3fs, above the %ss latency threshold" % (url, latency, latency_threshold))
+        return url, False, latency
+    return url, True, latency
+
+
+# Check the routes concurrently, at most concurrency of them at a time. Returns the
+# failed routes and the latency of each route.
+def process_routes(
+    watch_url_routes, iter_track_time, concurrency=8, connect_timeout=5, read_timeout=30, latency_threshold=0
+):
     failed_routes = []
+    route_latencies = {}
     if watch_url_routes:
         watch_routes_start_time = time.time()
-        for route_info in watch_url_routes:
-            # Might need to get different authorization types here
-            header = {"Accept": "application/json"}
-            if len(route_info) > 1:
-                header["Authorization"] = route_info[1]
-            route_status = is_url_available(route_info[0], header)
+        concurrency = max(1, concurrency)
+        session = get_routes_session(concurrency)
+        routes = [
+            route_settings(route_info, connect_timeout, read_timeout, latency_threshold)
+            for route_info in watch_url_routes
+        ]
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(routes))) as executor:
+            results = list(executor.map(lambda route: check_route(session, *route), routes))
+        for url, route_status, latency in results:
+            route_latencies[url] = latency
             if not route_status:
-                failed_routes.append(route_info[0])
+                failed_routes.append(url)
         iter_track_time["watch_routes"] = time.time() - watch_routes_start_time
-    return failed_routes
+    return failed_routes, route_latencies
+
+
+# Monitor the CSR's and return the ones that are not approved. They are read from the CSR
+# informer when it is running and in sync, otherwise listed as raw JSON records.
+def monitor_csrs():
+    if csr_informer is not None and csr_informer.fresh():
+        csrs = csr_informer.list()
+    else:
+        if csr_informer is not None:
+            logging.warning("CSR informer is not in sync, listing the CSR's")
+        csrs = list_continue_helper_raw(
+            certificates_cli.list_certificate_signing_request, csr_record, limit=request_chunk_size
+        )
+    return sorted(csr.name for csr in csrs if csr.pending)
 
 
-# Get CSR's in yaml format
-def get_csrs():
-    csr_string = runcommand.invoke("oc get csr -o yaml --kubeconfig " + kubeconfig_path_global, cmd_timeout)
-    csr_yaml = yaml.load(csr_string, Loader=yaml.FullLoader)
-    return csr_yaml
+def process_csrs(distribution, iter_track_time):
+    pending_csrs = []
+    if distribution == "openshift":
+        watch_csrs_start_time = time.time()
+        pending_csrs = monitor_csrs()
+        iter_track_time["watch_csrs"] = time.time() - watch_csrs_start_time
+    return pending_csrs
 
 
 def get_host() -> str:
@@ -0,0 +1,51 @@
+import logging
+import threading
+from collections import OrderedDict
+
+
+# Aggregates the Warning events of the pods in the watched namespaces, as handed over by
+# the event informers, per pod and reason. Only the reasons asked for are kept and at
+# most max_entries pods and reasons are held between two flushes, the least recently
+# updated ones are dropped beyond that. The count of an event is the number of times
+# it occurred, the events updated with a higher count only add the difference.
+class EventAggregator(object):
+    def __init__(self, namespaces, reasons, max_entries=1000):
+        self.namespaces = set(namespaces)
+        self.reasons = set(reasons)
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    def on_event(self, event_type, event, previous):
+        if event_type == "DELETED" or event.kind != "Pod" or event.reason not in self.reasons:
+            return
+        if event.namespace not in self.namespaces:
+            return
+        count = event.count
+        if previous is not None:
+            count -= previous.count
+        if count <= 0:
+            return
+        key = (event.namespace, event.name, event.reason)
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                count += entry[0]
+            self.entries[key] = (count, event.message)
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.dropped += 1
+
+    # Returns the events aggregated since the previous flush as a dict of namespace to
+    # the list of (pod, reason, count, message)
+    def flush(self):
+        with self.lock:
+            entries, self.entries = self.entries, OrderedDict()
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            logging.warning("Dropped %s pod events beyond the %s aggregated ones" % (dropped, self.max_entries))
+        events = {}
+        for (namespace, pod, reason), (count, message) in entries.items():
+            events.setdefault(namespace, []).append((pod, reason, count, message))
+        return events
@@ -0,0 +1,89 @@
+import re
+
+
+# The inline flags leading a pattern, (?i), which apply to the whole regex
+leading_flags = re.compile(r"\(\?([aiLmsux]+)\)")
+
+
+# Wrap the regex pattern in a group, named name when given, so that it can be one of the
+# alternatives of a combined regex. Its leading inline flags are scoped to the group,
+# (?i)^a becomes (?i:^a), as global flags are only allowed at the start of the regex.
+def pattern_group(pattern, name=None):
+    flags = ""
+    leading = leading_flags.match(pattern)
+    while leading is not None:
+        flags += leading.group(1)
+        end = leading.end()
+        pattern = pattern[end:]
+        leading = leading_flags.match(pattern)
+    if flags:
+        pattern = "(?%s:%s)" % (flags, pattern)
+    if name is not None:
+        return "(?P<%s>%s)" % (name, pattern)
+    return "(?:%s)" % (pattern)
+
+
+# Compile the regex patterns once into a single alternation, a name is then matched
+# against all of them in one pass. Returns None when there are no patterns.
+def compile_patterns(patterns):
+    if not patterns:
+        return None
+    return re.compile("|".join(pattern_group(pattern) for pattern in patterns))
+
+
+# Selects the pods checked in the watched namespaces. The pods whose name matches one of
+# the ignore patterns, does not match any of the include patterns or whose owner is of
+# one of the ignored kinds are left out. The decision is kept per pod uid, as neither the
+# name nor the owner of a pod change, so that the pods seen in the previous passes cost
+# a dict lookup. The label and field selectors are applied by the apiserver, they are
+# added to the list and watch calls of the pods through list_args.
+class PodFilter(object):
+    def __init__(
+        self,
+        ignore_pattern=None,
+        include_pattern=None,
+        ignore_owner_kinds=None,
+        label_selector="",
+        field_selector="",
+        max_entries=100000,
+    ):
+        self.ignore_regex = compile_patterns(ignore_pattern)
+        self.include_regex = compile_patterns(include_pattern)
+        self.ignore_owner_kinds = set(ignore_owner_kinds or ())
+        self.label_selector = label_selector or ""
+        self.field_selector = field_selector or ""
+        self.max_entries = max_entries
+        self.decisions = {}
+
+    # The decisions are not handed over to the pool workers with the filter
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["decisions"] = {}
+        return state
+
+    # Selector arguments of the list and watch calls of the pods, combined with the label
+    # selector of the caller if any
+    def list_args(self, label_selector=""):
+        list_args = {}
+        label_selector = ",".join(selector for selector in (label_selector, self.label_selector) if selector)
+        if label_selector:
+            list_args["label_selector"] = label_selector
+        if self.field_selector:
+            list_args["field_selector"] = self.field_selector
+        return list_args
+
+    def ignored_name(self, name):
+        if self.ignore_regex is not None and self.ignore_regex.match(name):
+            return True
+        return self.include_regex is not None and not self.include_regex.match(name)
+
+    # Whether the pod record is left out of the checks
+    def excluded(self, pod_info):
+        decision = self.decisions.get(pod_info.uid)
+        if decision is None:
+            decision = self.ignored_name(pod_info.name) or pod_info.owner_kind in self.ignore_owner_kinds
+            if pod_info.uid is not None:
+                if len(self.decisions) >= self.max_entries:
+                    self.decisions.clear()
+                self.decisions[pod_info.uid] = decision
+        return decision
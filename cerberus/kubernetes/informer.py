@@ -0,0 +1,190 @@
+import json
+import time
+import logging
+import threading
+from kubernetes.watch.watch import iter_resp_lines
+from kubernetes.client.rest import ApiException
+
+
+# Keeps an in-memory copy of the objects returned by a kubernetes list function
+# current by doing a single paginated LIST followed by a WATCH from the returned
+# resourceVersion. The list is redone only when the apiserver reports that the
+# resourceVersion is too old (410 Gone) or the watch fails. Responses are decoded
+# as plain JSON and every object is stored as returned by transform. The handlers are
+# called from the informer thread with the event type, the new and the previous object
+# for every change, the changes found by a list are reported as ADDED, MODIFIED and
+# DELETED events as well. The requests time out request_timeout seconds past the watch
+# timeout, the cache is no longer fresh once a list or watch failed or nothing was heard
+# from the apiserver for that long. With index set, the objects are grouped as well by
+# the key index returns for them, for list to return the ones of a single key.
+class Informer(object):
+    def __init__(
+        self,
+        list_func,
+        transform,
+        chunk_size,
+        watch_timeout=300,
+        retry_interval=5,
+        request_timeout=60,
+        index=None,
+        **list_args
+    ):
+        self.list_func = list_func
+        self.transform = transform
+        self.list_args = list_args
+        self.chunk_size = chunk_size
+        self.watch_timeout = watch_timeout
+        self.retry_interval = retry_interval
+        self.request_timeout = request_timeout
+        self.index = index
+        self.indexed = {}
+        self.last_synced = 0
+        self.resource_version = None
+        self.objects = {}
+        self.lock = threading.Lock()
+        self.synced = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.handlers = []
+
+    def add_handler(self, handler):
+        self.handlers.append(handler)
+
+    def dispatch(self, event_type, obj, previous):
+        for handler in self.handlers:
+            try:
+                handler(event_type, obj, previous)
+            except Exception as e:
+                logging.error("Exception in informer handler %s: %s\n" % (handler.__name__, e))
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def wait_for_sync(self, timeout=None):
+        return self.synced.wait(timeout)
+
+    # Whether the cache is synced and was confirmed current recently enough to be read
+    # instead of listing
+    def fresh(self):
+        return self.synced.is_set() and time.time() - self.last_synced <= self.watch_timeout + self.request_timeout
+
+    # Returns a snapshot of the cached objects, the ones of the given key of the index
+    # when it is set
+    def list(self, key=None):
+        with self.lock:
+            if key is not None:
+                return list(self.indexed.get(key, {}).values())
+            return list(self.objects.values())
+
+    def add_indexed(self, uid, obj):
+        if self.index is not None:
+            self.indexed.setdefault(self.index(obj), {})[uid] = obj
+
+    def remove_indexed(self, uid, obj):
+        if self.index is not None:
+            objects = self.indexed.get(self.index(obj))
+            if objects is not None:
+                objects.pop(uid, None)
+                if not objects:
+                    del self.indexed[self.index(obj)]
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                if self.resource_version is None:
+                    self.relist()
+                self.watch()
+            except ApiException as e:
+                self.synced.clear()
+                if e.status == 410:
+                    logging.info("Informer resourceVersion %s expired, relisting" % (self.resource_version))
+                else:
+                    logging.error("Exception in informer for %s: %s\n" % (self.list_func.__name__, e))
+                    self.stopped.wait(self.retry_interval)
+                self.resource_version = None
+            except Exception as e:
+                self.synced.clear()
+                logging.error("Exception in informer for %s: %s\n" % (self.list_func.__name__, e))
+                self.resource_version = None
+                self.stopped.wait(self.retry_interval)
+
+    def relist(self):
+        objects = {}
+        list_args = dict(self.list_args)
+        while True:
+            ret = json.loads(
+                self.list_func(
+                    limit=self.chunk_size, _preload_content=False, _request_timeout=self.request_timeout, **list_args
+                ).data
+            )
+            for item in ret["items"]:
+                objects[item["metadata"]["uid"]] = self.transform(item)
+            list_args["_continue"] = ret["metadata"].get("continue")
+            if not list_args["_continue"]:
+                break
+        with self.lock:
+            previous_objects, self.objects = self.objects, objects
+            self.indexed = {}
+            for uid, obj in objects.items():
+                self.add_indexed(uid, obj)
+        self.resource_version = ret["metadata"]["resourceVersion"]
+        if self.handlers:
+            for uid, obj in objects.items():
+                previous = previous_objects.get(uid)
+                if previous is None:
+                    self.dispatch("ADDED", obj, None)
+                elif previous != obj:
+                    self.dispatch("MODIFIED", obj, previous)
+            for uid, previous in previous_objects.items():
+                if uid not in objects:
+                    self.dispatch("DELETED", previous, previous)
+        self.last_synced = time.time()
+        self.synced.set()
+
+    def watch(self):
+        response = self.list_func(
+            watch=True,
+            resource_version=self.resource_version,
+            timeout_seconds=self.watch_timeout,
+            allow_watch_bookmarks=True,
+            _preload_content=False,
+            _request_timeout=self.watch_timeout + self.request_timeout,
+            **self.list_args
+        )
+        try:
+            for line in iter_resp_lines(response):
+                if self.stopped.is_set():
+                    break
+                self.last_synced = time.time()
+                if not line:
+                    continue
+                event = json.loads(line)
+                event_type = event["type"]
+                item = event["object"]
+                if event_type == "ERROR":
+                    raise ApiException(status=item.get("code"), reason=item.get("message"))
+                if event_type != "BOOKMARK":
+                    uid = item["metadata"]["uid"]
+                    obj = self.transform(item)
+                    with self.lock:
+                        if event_type == "DELETED":
+                            previous = self.objects.pop(uid, None)
+                        else:
+                            previous = self.objects.get(uid)
+                            self.objects[uid] = obj
+                        if previous is not None:
+                            self.remove_indexed(uid, previous)
+                        if event_type != "DELETED":
+                            self.add_indexed(uid, obj)
+                    if self.handlers:
+                        self.dispatch(event_type, obj, previous)
+                self.resource_version = item["metadata"]["resourceVersion"]
+            # The watch timed out on the apiserver side with nothing missed
+            self.last_synced = time.time()
+        finally:
+            response.close()
+            response.release_conn()
@@ -0,0 +1,64 @@
+import re
+import logging
+import threading
+from cerberus.kubernetes.filter import pattern_group
+
+
+# Resolves the entries of watch_namespaces against the namespaces of the cluster. The
+# entries naming an existing namespace are taken literally, the others are regex patterns
+# searched in the namespace names, all of them compiled once into a single alternation
+# with a named group per pattern to tell which one matched. The active namespaces are
+# kept current by on_namespace, as the handler of a namespace informer, when the
+# namespaces are rediscovered during the run.
+class NamespaceResolver(object):
+    def __init__(self, names, patterns):
+        self.names = set(names)
+        self.patterns = list(patterns)
+        self.groups = dict(("pattern%s" % index, pattern) for index, pattern in enumerate(self.patterns))
+        self.regex = None
+        if self.groups:
+            self.regex = re.compile("|".join(pattern_group(pattern, name) for name, pattern in self.groups.items()))
+        self.active = set()
+        self.lock = threading.Lock()
+
+    # Returns the entry of watch_namespaces matching the namespace, if any
+    def match(self, namespace):
+        if namespace in self.names:
+            return namespace
+        if self.regex is None:
+            return None
+        match = self.regex.search(namespace)
+        if match is None:
+            return None
+        return self.groups[match.lastgroup]
+
+    # Sets the active namespaces from a list of the namespaces of the cluster, returns
+    # the patterns which did not match any of them
+    def resolve(self, namespaces):
+        matched = set()
+        active = set()
+        for namespace in namespaces:
+            entry = self.match(namespace)
+            if entry is not None:
+                active.add(namespace)
+                matched.add(entry)
+        with self.lock:
+            self.active = active
+        return [pattern for pattern in self.patterns if pattern not in matched]
+
+    def namespaces(self):
+        with self.lock:
+            return sorted(self.active)
+
+    def on_namespace(self, event_type, namespace_info, previous):
+        namespace = namespace_info.name
+        if self.match(namespace) is None:
+            return
+        with self.lock:
+            if event_type == "DELETED":
+                if namespace in self.active:
+                    logging.info("Namespace %s was deleted, it is no longer watched" % (namespace))
+                self.active.discard(namespace)
+            elif namespace not in self.active:
+                logging.info("Namespace %s was created, it is now watched" % (namespace))
+                self.active.add(namespace)
@@ -0,0 +1,199 @@
+from datetime import datetime
+from collections import namedtuple
+
+
+# Compact records holding only the fields of the kubernetes objects read by the checks.
+# They are built straight from the decoded JSON of the list and watch responses which
+# avoids constructing the deep trees of the kubernetes client models.
+PodRecord = namedtuple(
+    "PodRecord",
+    [
+        "namespace",
+        "name",
+        "uid",
+        "phase",
+        "creation_timestamp",
+        "conditions",
+        "containers",
+        "init_containers",
+        "owner_kind",
+    ],
+)
+
+ContainerRecord = namedtuple("ContainerRecord", ["name", "ready", "restart_count"])
+
+NodeRecord = namedtuple("NodeRecord", ["name", "conditions", "taints"])
+
+LeaseRecord = namedtuple("LeaseRecord", ["name", "holder", "renew_time", "duration", "transitions"])
+
+NamespaceRecord = namedtuple("NamespaceRecord", ["name", "phase"])
+
+EventRecord = namedtuple("EventRecord", ["namespace", "kind", "name", "reason", "message", "count"])
+
+CsrRecord = namedtuple("CsrRecord", ["name", "pending"])
+
+WorkloadRecord = namedtuple("WorkloadRecord", ["namespace", "kind", "name", "desired", "ready", "selector"])
+
+
+def conditions_record(conditions):
+    return tuple((condition.get("type"), condition.get("status")) for condition in conditions or ())
+
+
+def containers_record(container_statuses):
+    return tuple(
+        ContainerRecord(container.get("name"), container.get("ready", False), container.get("restartCount", 0))
+        for container in container_statuses or ()
+    )
+
+
+# Kind of the controller of an object, or of its first owner
+def owner_kind(metadata):
+    owner_references = metadata.get("ownerReferences") or ()
+    for owner_reference in owner_references:
+        if owner_reference.get("controller"):
+            return owner_reference.get("kind")
+    return owner_references[0].get("kind") if owner_references else None
+
+
+# Project a pod from the decoded JSON of a list or watch response
+def pod_record(pod):
+    metadata = pod["metadata"]
+    status = pod.get("status") or {}
+    return PodRecord(
+        metadata.get("namespace"),
+        metadata["name"],
+        metadata.get("uid"),
+        status.get("phase"),
+        metadata.get("creationTimestamp"),
+        conditions_record(status.get("conditions")),
+        containers_record(status.get("containerStatuses")),
+        containers_record(status.get("initContainerStatuses")),
+        owner_kind(metadata),
+    )
+
+
+# Project a row of a server side Table of pods into a pod record holding the fields read
+# by the crash/restart tracker: the Status column stands for the phase, Completed for
+# Succeeded, and the Restarts column for the restart count of a single container. The
+# full pods sent by the apiservers without Table support are projected as usual.
+def pod_table_record(row):
+    if "cells" not in row:
+        return pod_record(row)
+    metadata = row["metadata"]
+    cells = row["cells"]
+    status = cells.get("Status")
+    restarts = str(cells.get("Restarts") or 0).split()[0]
+    return PodRecord(
+        metadata.get("namespace"),
+        metadata["name"],
+        metadata.get("uid"),
+        "Succeeded" if status == "Completed" else status,
+        metadata.get("creationTimestamp"),
+        (),
+        (ContainerRecord(None, None, int(restarts) if restarts.isdigit() else 0),),
+        (),
+        owner_kind(metadata),
+    )
+
+
+# Project a node from the decoded JSON of a list or watch response
+def node_record(node):
+    spec = node.get("spec") or {}
+    status = node.get("status") or {}
+    return NodeRecord(
+        node["metadata"]["name"],
+        conditions_record(status.get("conditions")),
+        tuple((taint.get("key"), taint.get("effect")) for taint in spec.get("taints") or ()),
+    )
+
+
+# Project a lease from the decoded JSON of a list or watch response, renewTime is
+# converted to seconds since the epoch
+def lease_record(lease):
+    spec = lease.get("spec") or {}
+    renew_time = spec.get("renewTime")
+    if renew_time:
+        renew_time = datetime.fromisoformat(renew_time.replace("Z", "+00:00")).timestamp()
+    return LeaseRecord(
+        lease["metadata"]["name"],
+        spec.get("holderIdentity"),
+        renew_time,
+        spec.get("leaseDurationSeconds"),
+        spec.get("leaseTransitions"),
+    )
+
+
+# Project a namespace from the decoded JSON of a list or watch response
+def namespace_record(namespace):
+    return NamespaceRecord(namespace["metadata"]["name"], (namespace.get("status") or {}).get("phase"))
+
+
+# Project an event from the decoded JSON of a list or watch response, only the object it
+# is about, its reason, the start of its message and its count are kept. The count of an
+# event series is read from series.count, which is kept current instead of count.
+def event_record(event):
+    involved_object = event.get("involvedObject") or {}
+    series = event.get("series") or {}
+    return EventRecord(
+        involved_object.get("namespace") or event["metadata"].get("namespace"),
+        involved_object.get("kind"),
+        involved_object.get("name"),
+        event.get("reason"),
+        (event.get("message") or "")[:256],
+        series.get("count") or event.get("count") or 1,
+    )
+
+
+# Project a CSR from the decoded JSON of a list or watch response, a CSR is pending until
+# its first condition is Approved. The PEM encoded request of its spec is not kept.
+def csr_record(csr):
+    conditions = (csr.get("status") or {}).get("conditions")
+    return CsrRecord(csr["metadata"]["name"], not conditions or "Approved" not in conditions[0].get("type", ""))
+
+
+# Render the label selector of a workload as the labelSelector parameter of a list call
+def label_selector(selector):
+    requirements = ["%s=%s" % (key, value) for key, value in sorted((selector.get("matchLabels") or {}).items())]
+    for expression in selector.get("matchExpressions") or ():
+        key, operator, values = expression["key"], expression["operator"], expression.get("values") or ()
+        if operator == "In":
+            requirements.append("%s in (%s)" % (key, ",".join(values)))
+        elif operator == "NotIn":
+            requirements.append("%s notin (%s)" % (key, ",".join(values)))
+        elif operator == "Exists":
+            requirements.append(key)
+        elif operator == "DoesNotExist":
+            requirements.append("!" + key)
+    return ",".join(requirements)
+
+
+def workload_record(kind, workload, desired, ready):
+    metadata = workload["metadata"]
+    return WorkloadRecord(
+        metadata.get("namespace"),
+        kind,
+        metadata["name"],
+        desired or 0,
+        ready or 0,
+        label_selector((workload.get("spec") or {}).get("selector") or {}),
+    )
+
+
+# Project a deployment from the decoded JSON of a list or watch response
+def deployment_record(deployment):
+    spec = deployment.get("spec") or {}
+    status = deployment.get("status") or {}
+    return workload_record("Deployment", deployment, spec.get("replicas", 1), status.get("readyReplicas"))
+
+
+# Project a statefulset from the decoded JSON of a list or watch response
+def statefulset_record(statefulset):
+    spec = statefulset.get("spec") or {}
+    status = statefulset.get("status") or {}
+    return workload_record("StatefulSet", statefulset, spec.get("replicas", 1), status.get("readyReplicas"))
+
+
+# Project a daemonset from the decoded JSON of a list or watch response
+def daemonset_record(daemonset):
+    status = daemonset.get("status") or {}
+    return workload_record("DaemonSet", daemonset, status.get("desiredNumberScheduled"), status.get("numberReady"))
@@ -0,0 +1,105 @@
+import time
+import logging
+import threading
+from datetime import datetime
+import cerberus.database.client as dbcli
+import cerberus.kubernetes.client as kubecli
+
+
+# Applies the failure rules of the periodic checks to the pod, node and namespace watch
+# events as they arrive: pods which are not ready, restarted or deleted, nodes which are
+# not ready and watched namespaces which are not active. The objects failing the rules
+# are tracked and the status of the events source of the publisher is updated on every
+# change, so the go/no-go signal reflects a failure right away instead of at the end of
+# the sleep interval.
+class StatusWatcher(object):
+    def __init__(self, publisher, namespaces):
+        self.publisher = publisher
+        self.namespaces = set(namespaces)
+        self.failing = {}
+        self.lock = threading.Lock()
+        self.publisher.set("events", True)
+
+    def healthy(self):
+        with self.lock:
+            return not self.failing
+
+    def failures(self):
+        with self.lock:
+            return dict(self.failing)
+
+    def update(self, key, failure):
+        with self.lock:
+            previous = self.failing.get(key)
+            if failure is None:
+                self.failing.pop(key, None)
+            else:
+                self.failing[key] = failure
+            healthy = not self.failing
+        if failure != previous:
+            if failure is None:
+                logging.info("%s %s recovered" % key)
+            else:
+                logging.info("%s %s: %s" % (key + (failure,)))
+            self.publisher.set("events", healthy)
+
+    # Sets the watched namespaces, the failures in the namespaces no longer watched are
+    # dropped
+    def set_namespaces(self, namespaces):
+        with self.lock:
+            self.namespaces = set(namespaces)
+            for kind, name in list(self.failing):
+                if (kind == "Pod" and name.split("/")[0] not in self.namespaces) or (
+                    kind == "Namespace" and name not in self.namespaces
+                ):
+                    del self.failing[(kind, name)]
+            healthy = not self.failing
+        self.publisher.set("events", healthy)
+
+    def on_pod(self, event_type, pod_info, previous):
+        if pod_info.namespace not in self.namespaces or kubecli.pod_filter.excluded(pod_info):
+            return
+        key = ("Pod", "%s/%s" % (pod_info.namespace, pod_info.name))
+        if event_type == "DELETED":
+            self.update(key, None)
+            return
+        if previous is not None:
+            restarts = kubecli.restart_count(pod_info) - kubecli.restart_count(previous)
+            if restarts > 0:
+                logging.info("Pod %s/%s restarted %s times" % (pod_info.namespace, pod_info.name, restarts))
+                dbcli.insert(
+                    datetime.now(), time.time(), restarts, "pod restart", [pod_info.name], component(pod_info.namespace)
+                )
+        ready, notready_containers = kubecli.pod_readiness(pod_info)
+        if ready and not notready_containers:
+            self.update(key, None)
+        elif notready_containers:
+            self.update(key, "containers not ready %s" % (notready_containers))
+        else:
+            self.update(key, "not ready, phase %s" % (pod_info.phase))
+
+    def on_node(self, event_type, node_info, previous):
+        key = ("Node", node_info.name)
+        if event_type != "DELETED" and not kubecli.is_node_ready(node_info):
+            self.update(key, "not ready")
+        else:
+            self.update(key, None)
+
+    def on_namespace(self, event_type, namespace_info, previous):
+        if namespace_info.name not in self.namespaces:
+            return
+        key = ("Namespace", namespace_info.name)
+        if event_type == "DELETED":
+            self.update(key, "deleted")
+        elif namespace_info.phase != "Active":
+            self.update(key, namespace_info.phase)
+        else:
+            self.update(key, None)
+
+
+# Component name of a namespace as stored in the failure database
+def component(namespace):
+    component = namespace.split("-")
+    if component[0] == "openshift":
+        return "-".join(component[1:])
+    return "-".join(component)
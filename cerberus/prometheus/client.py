@@ -40,3 +40,31 @@ def process_prom_query(query):
             logging.error("Failed to get the metrics: %s" % e)
     else:
         logging.info("Skipping the prometheus query as the prometheus client couldn't " "be initilized\n")
+
+
+# Prometheus query to alert on high apiserver latencies
+apiserver_latency_query = r"""ALERTS{alertname="KubeAPILatencyHigh", severity="warning"}"""
+# Prometheus query to alert when etcd fync duration is high
+etcd_leader_changes_query = r"""ALERTS{alertname="etcdHighNumberOfLeaderChanges", severity="warning"}"""  # noqa
+
+
+# Alert on high API server latencies and frequent etcd leader elections
+def process_prom_alerts():
+    metrics = process_prom_query(apiserver_latency_query)
+    if metrics:
+        logging.warning(
+            "Kubernetes API server latency is high. "
+            "More than 99th percentile latency for given requests to the "
+            "kube-apiserver is above 1 second.\n"
+        )
+        logging.info("%s\n" % (metrics))
+
+    metrics = process_prom_query(etcd_leader_changes_query)
+    if metrics:
+        logging.warning(
+            "Observed increase in number of etcd leader elections over the last "
+            "15 minutes. Frequent elections may be a sign of insufficient resources, "
+            "high network latency, or disruptions by other components and should be "
+            "investigated.\n"
+        )
+        logging.info("%s\n" % (metrics))
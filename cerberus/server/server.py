@@ -1,14 +1,18 @@
 import sys
+import json
 import logging
 import _thread
 import cerberus.database.client as dbcli
 from urllib.parse import urlparse, parse_qsl
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 
 
 # Start a simple http server to publish the cerberus status file content
 class SimpleHTTPRequestHandler(BaseHTTPRequestHandler):
     requests_served = 0
+    # The failures are streamed with chunked transfer encoding
+    protocol_version = "HTTP/1.1"
+    chunk_size = 65536
 
     def do_GET(self):
         if self.path == "/":
@@ -19,60 +23,123 @@ class SimpleHTTPRequestHandler(BaseHTTPRequestHandler):
             self.do_analyze()
         elif self.path.startswith("/analysis"):
             self.do_analysis()
+        else:
+            self.send_error(404)
 
-    def do_status(self):
+    def send_file(self, path):
+        with open(path, "rb") as f:
+            content = f.read()
         self.send_response(200)
+        self.send_header("Content-Length", str(len(content)))
         self.end_headers()
-        f = open("/tmp/cerberus_status", "rb")
-        self.wfile.write(f.read())
+        self.wfile.write(content)
+
+    def do_status(self):
+        self.send_file("/tmp/cerberus_status")
         SimpleHTTPRequestHandler.requests_served = SimpleHTTPRequestHandler.requests_served + 1
 
     def do_history(self):
-        parsed = urlparse(self.path)
+        params = dict(parse_qsl(urlparse(self.path).query))
         try:
-            loopback = int(float(dict(parse_qsl(parsed.query))["loopback"]) * 60)
+            loopback = int(float(params["loopback"]) * 60)
         except Exception:
             loopback = 3600
-        try:
-            dbcli.query(loopback)
-            self.send_response(200)
-            self.end_headers()
-            f = open("./history/cerberus_history.json", "rb")
-            self.wfile.write(f.read())
-        except Exception as e:
-            self.send_error(404, "Encountered the following error: %s. Please retry" % e)
+        self.send_failures(params, lambda limit, after: dbcli.query(loopback, limit, after))
 
     def do_analyze(self):
         try:
-            self.send_response(200)
-            self.end_headers()
-            f = open("./history/analysis.html", "rb")
-            self.wfile.write(f.read())
+            self.send_file("./history/analysis.html")
         except Exception as e:
             self.send_error(404, "Encountered the following error: %s. Please retry" % e)
 
     def do_analysis(self):
         formdata = dict(parse_qsl(urlparse(self.path).query, keep_blank_values=True))
         for key in ["issue", "name", "component"]:
-            formdata[key] = formdata[key].strip().split(",")
+            formdata[key] = formdata.get(key, "").strip().split(",")
             if not formdata[key]:
                 formdata[key] = ()
             else:
                 formdata[key] = tuple(value.strip() for value in formdata[key] if value.strip())
+        self.send_failures(formdata, lambda limit, after: dbcli.custom_query(formdata, limit, after))
+
+    # Streams the failures returned by query for the limit and after parameters, as the
+    # indented json document of the history or as a json object per line when ndjson is
+    # asked for through the format parameter or the Accept header. When the page is full
+    # the cursor of its last failure is sent as next, to be passed as after for the next.
+    def send_failures(self, params, query):
+        ndjson = params.get("format") == "ndjson" or "application/x-ndjson" in self.headers.get("Accept", "")
         try:
-            dbcli.custom_query(formdata)
-            self.send_response(200)
-            self.end_headers()
-            f = open("./history/cerberus_analysis.json", "rb")
-            self.wfile.write(f.read())
+            limit = int(params["limit"]) if params.get("limit") else None
+            if limit is not None and limit <= 0:
+                raise ValueError("limit has to be a positive integer")
+            failures = query(limit, params.get("after") or None)
+            first = next(failures, None)
+        except ValueError as e:
+            self.send_error(400, "Invalid parameters: %s" % e)
+            return
         except Exception as e:
             self.send_error(404, "Encountered the following error: %s. Please retry" % e)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson" if ndjson else "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        chunk = []
+        chunk_length = 0
+        count = 0
+        cursor = None
+        try:
+            if not ndjson:
+                chunk.append('{\n    "history": {\n        "failures": [')
+            while first is not None:
+                failure, cursor = first
+                if ndjson:
+                    chunk.append(json.dumps(failure) + "\n")
+                else:
+                    # Indented as json.dump did with indent=4 for the whole document
+                    fields = ",".join(
+                        "\n                %s: %s" % (json.dumps(key), json.dumps(value))
+                        for key, value in failure.items()
+                    )
+                    chunk.append(
+                        "%s{%s\n            }" % ("\n            " if count == 0 else ",\n            ", fields)
+                    )
+                chunk_length += len(chunk[-1])
+                count += 1
+                if chunk_length >= self.chunk_size:
+                    self.write_chunk("".join(chunk))
+                    chunk = []
+                    chunk_length = 0
+                first = next(failures, None)
+            next_cursor = cursor if limit is not None and count == limit else None
+            if ndjson:
+                if next_cursor:
+                    chunk.append(json.dumps({"next": next_cursor}) + "\n")
+            else:
+                chunk.append("\n        ]" if count else "]")
+                if next_cursor:
+                    chunk.append(',\n        "next": %s' % (json.dumps(next_cursor)))
+                chunk.append("\n    }\n}")
+            self.write_chunk("".join(chunk))
+            self.wfile.write(b"0\r\n\r\n")
+        except Exception as e:
+            # The response is left unterminated for the client to notice it is truncated
+            logging.error("Failed to send the failures: %s" % e)
+            self.close_connection = True
+        finally:
+            failures.close()
+
+    # An empty chunk would end the response
+    def write_chunk(self, data):
+        if data:
+            data = data.encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
 
 
 def start_server(address):
     server = address[0]
     port = address[1]
-    httpd = HTTPServer(address, SimpleHTTPRequestHandler)
+    httpd = ThreadingHTTPServer(address, SimpleHTTPRequestHandler)
     logging.info("Starting http server at http://%s:%s\n" % (server, port))
     try:
         _thread.start_new_thread(httpd.serve_forever, ())
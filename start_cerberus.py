@@ -13,19 +13,185 @@ import functools
 import importlib
 import multiprocessing
 from itertools import repeat
+from multiprocessing.pool import ThreadPool
 from datetime import datetime
 from collections import defaultdict
 import cerberus.server.server as server
 import cerberus.inspect.inspect as inspect
 import cerberus.invoke.command as runcommand
 import cerberus.kubernetes.client as kubecli
+import cerberus.kubernetes.apiserver as apiserver
 import cerberus.slack.slack_client as slackcli
 import cerberus.prometheus.client as promcli
 import cerberus.database.client as dbcli
-
-
-def smap(f):
-    return f()
+import cerberus.engine.engine as engine
+import cerberus.engine.scheduler as engine_scheduler
+import cerberus.engine.publisher as status_publisher
+import cerberus.kubernetes.watcher as watcher
+import cerberus.kubernetes.events as events
+import cerberus.kubernetes.filter as filters
+
+
+# Run the function over the arguments in the current process
+def local_starmap(f, iterable):
+    return [f(*args) for args in iterable]
+
+
+# Split the pod snapshot into the per namespace argument of the namespace checks, the
+# namespaces missing from it, watched since it was taken, are listed by the checks
+def snapshot_args(pods_snapshot, namespaces):
+    if pods_snapshot is None:
+        return repeat(None)
+    return [pods_snapshot.get(namespace) for namespace in namespaces]
+
+
+# Check the readiness of the pods of all the namespaces in parallel, the pods are listed
+# once for all of them when the snapshot is shared. Returns the failed pods and the
+# failed containers of each namespace.
+def process_namespaces(
+    starmap, manager, iteration, watch_namespaces, iter_track_time, pods_snapshot=None, snapshot=None
+):
+    watch_namespaces_start_time = time.time()
+    if snapshot is not None and pods_snapshot is None:
+        pods_snapshot = kubecli.get_pod_snapshot(watch_namespaces, snapshot["cluster_wide"])
+    failed_pods_components = manager.dict()
+    failed_pod_containers = manager.dict()
+    starmap(
+        kubecli.process_namespace,
+        zip(
+            repeat(iteration),
+            watch_namespaces,
+            repeat(failed_pods_components),
+            repeat(failed_pod_containers),
+            snapshot_args(pods_snapshot, watch_namespaces),
+        ),
+    )
+    iter_track_time["watch_namespaces"] = time.time() - watch_namespaces_start_time
+    return dict(failed_pods_components), dict(failed_pod_containers)
+
+
+# Check the readiness of the deployments, statefulsets and daemonsets of all the namespaces
+# in parallel instead of the one of each pod, they are listed once for all of them when
+# the snapshot is shared. Returns the degraded workloads and the failed containers of
+# their pods in each namespace.
+def process_workloads(starmap, manager, iteration, watch_namespaces, iter_track_time, snapshot=None):
+    watch_namespaces_start_time = time.time()
+    workloads_snapshot = None
+    if snapshot is not None:
+        workloads_snapshot = kubecli.get_workload_snapshot(watch_namespaces, snapshot["cluster_wide"])
+    failed_workloads_components = manager.dict()
+    failed_pod_containers = manager.dict()
+    starmap(
+        kubecli.process_workloads,
+        zip(
+            repeat(iteration),
+            watch_namespaces,
+            repeat(failed_workloads_components),
+            repeat(failed_pod_containers),
+            snapshot_args(workloads_snapshot, watch_namespaces),
+        ),
+    )
+    iter_track_time["watch_namespaces"] = time.time() - watch_namespaces_start_time
+    return dict(failed_workloads_components), dict(failed_pod_containers)
+
+
+# Components reported by the given results of a check, the ones at index when given, in
+# the order they were first reported
+def merge_failed(results, index=None):
+    failed = {}
+    for result in results:
+        for component in result if index is None else result[index]:
+            failed[component] = True
+    return list(failed)
+
+
+# Failed pods and containers of each namespace reported by the given results of the
+# namespaces check
+def merge_namespace_failures(results):
+    failed_pods_components = {}
+    failed_pod_containers = {}
+    for components, containers in results:
+        for namespace, failures in components.items():
+            failed_pods_components[namespace] = merge_failed([failed_pods_components.get(namespace, []), failures])
+        for namespace, pods in containers.items():
+            failed_pod_containers.setdefault(namespace, {}).update(pods)
+    return failed_pods_components, failed_pod_containers
+
+
+# Track the pod crashes/restarts in all the namespaces in parallel against the state of
+# each namespace kept in pods_tracker. Returns the pods snapshot when it is shared, to
+# be reused by the readiness checks, the namespaces tracked and the output of each one.
+# A failed list fails the pass instead of evicting the pods it missed from the tracker.
+def track_pods(starmap, watch_namespaces, pods_tracker, snapshot=None):
+    pods_snapshot = None
+    if snapshot is not None:
+        pods_snapshot = kubecli.get_pod_snapshot(watch_namespaces, snapshot["cluster_wide"], raise_errors=True)
+    tracker_outputs = starmap(
+        kubecli.namespace_sleep_tracker,
+        zip(
+            watch_namespaces,
+            [pods_tracker.get(namespace, {}) for namespace in watch_namespaces],
+            snapshot_args(pods_snapshot, watch_namespaces),
+        ),
+    )
+    return pods_snapshot, watch_namespaces, tracker_outputs
+
+
+# Merge the latest pass of the pod tracker into pods_tracker when it was submitted after
+# the previous merge, so that it was computed from the current state. The crashed and
+# restarted pods it found are added to crashed_restarted_pods. Returns the time of the
+# merge, the one given when there was nothing to merge.
+def merge_pod_tracker(scheduler, pods_tracker, merged_time, crashed_restarted_pods):
+    result_time = scheduler.result_time("pod_tracker")
+    if result_time is None or (merged_time is not None and result_time <= merged_time):
+        return merged_time
+    pods_snapshot, tracked_namespaces, tracker_outputs = scheduler.result("pod_tracker")
+    for namespace, pods in kubecli.merge_tracker_updates(pods_tracker, tracked_namespaces, tracker_outputs).items():
+        crashed_restarted_pods.setdefault(namespace, []).extend(pods)
+    return time.time()
+
+
+# Run a pass of the pod tracker, merging first the pass which completed late since the
+# previous merge, which is reported late but not lost. A pass which fails or misses its
+# deadline leaves the tracker state as it is. Returns the time of the latest merge, None
+# while the tracker is not seeded, and the pods snapshot of the pass when it was just run
+# and merged, to be reused by the readiness checks.
+def run_pod_tracker(scheduler, pods_tracker, merged_time, crashed_restarted_pods):
+    merged_time = merge_pod_tracker(scheduler, pods_tracker, merged_time, crashed_restarted_pods)
+    if not scheduler.run("pod_tracker"):
+        return merged_time, None
+    previous_time = merged_time
+    merged_time = merge_pod_tracker(scheduler, pods_tracker, merged_time, crashed_restarted_pods)
+    if merged_time == previous_time:
+        return merged_time, None
+    return merged_time, scheduler.result("pod_tracker")[0]
+
+
+# Run the custom checks, returns whether all of them passed and their messages
+def process_custom_checks(custom_checks_imports):
+    custom_checks_fail_messages = []
+    custom_checks_status = True
+    for check in custom_checks_imports:
+        check_returns = check.main()
+        if type(check_returns) == bool:
+            custom_checks_status = custom_checks_status and check_returns
+        elif type(check_returns) == dict:
+            status = check_returns["status"]
+            message = check_returns["message"]
+            custom_checks_status = custom_checks_status and status
+            custom_checks_fail_messages.append(message)
+    return custom_checks_status, custom_checks_fail_messages
+
+
+# Interval, jitter and timeout in seconds of a check as set in check_schedule, checks
+# without an interval run once per iteration
+def check_settings(check_schedule, name):
+    settings = check_schedule.get(name) or {}
+    return {
+        "interval": settings.get("interval", 0),
+        "jitter": settings.get("jitter", 0),
+        "timeout": settings.get("timeout"),
+    }
 
 
 # define Python user-defined exceptions
@@ -58,8 +224,9 @@ def print_final_status_json(iterations, cerberus_status, exit_status_code):
     logging.info("Final status information written to final_cerberus_info.json")
 
 
-# Create a json file of operation timings
-def record_time(time_tracker):
+# Create a json file of operation timings and of the number of times each check missed
+# its deadline
+def record_time(time_tracker, deadline_misses=None):
     if time_tracker:
         average = defaultdict(float)
         for check in time_tracker["Iteration 1"]:
@@ -70,6 +237,8 @@ def record_time(time_tracker):
                     iterations += 1
             average[check] /= iterations
         time_tracker["Average"] = average
+    if deadline_misses:
+        time_tracker["Deadline misses"] = deadline_misses
     with open("./time_tracker.json", "w+") as file:
         json.dump(time_tracker, file, indent=4, separators=(",", ": "))
 
@@ -91,9 +260,12 @@ def main(cfg):
         watch_cluster_operators = config["cerberus"].get("watch_cluster_operators", False)
         watch_namespaces = config["cerberus"].get("watch_namespaces", [])
         watch_namespaces_ignore_pattern = config["cerberus"].get("watch_namespaces_ignore_pattern", [])
+        watch_namespaces_rediscovery = config["cerberus"].get("watch_namespaces_rediscovery", False)
+        pod_filter = config["cerberus"].get("pod_filter", {}) or {}
         watch_terminating_namespaces = config["cerberus"].get("watch_terminating_namespaces", True)
         watch_url_routes = config["cerberus"].get("watch_url_routes", [])
         watch_master_schedulable = config["cerberus"].get("watch_master_schedulable", {})
+        watch_events = config["cerberus"].get("watch_events", {})
         cerberus_publish_status = config["cerberus"].get("cerberus_publish_status", False)
         inspect_components = config["cerberus"].get("inspect_components", False)
         slack_integration = config["cerberus"].get("slack_integration", False)
@@ -106,12 +278,39 @@ def main(cfg):
         request_chunk_size = config["tunings"].get("kube_api_request_chunk_size", 250)
         daemon_mode = config["tunings"].get("daemon_mode", False)
         cores_usage_percentage = config["tunings"].get("cores_usage_percentage", 0.5)
+        pod_informer_cache = config["tunings"].get("pod_informer_cache", False)
+        shared_pod_snapshot = config["tunings"].get("shared_pod_snapshot", False)
+        workload_rollup = config["tunings"].get("workload_rollup", False)
+        api_compression = config["tunings"].get("api_compression", False)
+        pod_tracker_table = config["tunings"].get("pod_tracker_table", False)
+        node_health_from_leases = config["tunings"].get("node_health_from_leases", False)
+        node_conditions_refresh = config["tunings"].get("node_conditions_refresh", 10)
+        execution_engine = config["tunings"].get("execution_engine", "multiprocessing").lower()
+        thread_concurrency = config["tunings"].get("thread_concurrency", 16)
+        cluster_wide_snapshot_threshold = config["tunings"].get("cluster_wide_snapshot_threshold", 10)
+        routes_concurrency = config["tunings"].get("routes_concurrency", 8)
+        event_driven_status = config["tunings"].get("event_driven_status", False)
+        status_coalesce_interval = config["tunings"].get("status_coalesce_interval", 0.2)
+        iteration_budget = config["tunings"].get("iteration_budget", 0)
+        check_timeout = config["tunings"].get("check_timeout", 0)
+        check_schedule = config["tunings"].get("check_schedule", {}) or {}
+        apiserver_probe_interval = config["tunings"].get("apiserver_probe_interval", 5)
+        apiserver_probe_timeout = config["tunings"].get("apiserver_probe_timeout", 5)
+        routes_connect_timeout = config["tunings"].get("routes_connect_timeout", 5)
+        routes_read_timeout = config["tunings"].get("routes_read_timeout", 30)
+        routes_latency_threshold = config["tunings"].get("routes_latency_threshold", 0)
         if "database" in config.keys():
             database_path = config["database"].get("database_path", "/tmp/cerberus.db")
             reuse_database = config["database"].get("reuse_database", False)
+            database_queue_size = config["database"].get("queue_size", 10000)
+            database_flush_interval = config["database"].get("flush_interval", 1)
+            database_retention = config["database"].get("retention", {})
         else:
             database_path = "/tmp/cerberus.db"
             reuse_database = False
+            database_queue_size = 10000
+            database_flush_interval = 1
+            database_retention = {}
         # Initialize custom checks vars
         custom_checks_status = True
         custom_checks_fail_messages = []
@@ -121,16 +320,39 @@ def main(cfg):
             logging.error("Proper kubeconfig not set, please set proper kubeconfig path")
             print_final_status_json(-1, "Unknown", 1)
             sys.exit(1)
+        if not isinstance(routes_concurrency, int) or routes_concurrency < 1:
+            logging.error("routes_concurrency has to be a positive integer, got %s" % (routes_concurrency))
+            print_final_status_json(-1, "Unknown", 1)
+            sys.exit(1)
         os.environ["KUBECONFIG"] = str(kubeconfig_path)
         logging.info("Initializing client to talk to the Kubernetes cluster")
-        kubecli.initialize_clients(kubeconfig_path, request_chunk_size, cmd_timeout)
+        kubecli.initialize_clients(
+            kubeconfig_path,
+            request_chunk_size,
+            cmd_timeout,
+            thread_concurrency if execution_engine == "threads" else None,
+            api_compression,
+            pod_tracker_table,
+        )
 
         if "openshift-sdn" in watch_namespaces:
             sdn_namespace = kubecli.check_sdn_namespace()
             watch_namespaces = [namespace.replace("openshift-sdn", sdn_namespace) for namespace in watch_namespaces]
 
+        # Select the pods checked in the watched namespaces
+        kubecli.set_pod_filter(
+            filters.PodFilter(
+                watch_namespaces_ignore_pattern,
+                pod_filter.get("include_pattern", []),
+                pod_filter.get("ignore_owner_kinds", []),
+                pod_filter.get("label_selector", ""),
+                pod_filter.get("field_selector", ""),
+            )
+        )
+
         # Check if all the namespaces under watch_namespaces are valid
-        watch_namespaces = kubecli.check_namespaces(watch_namespaces)
+        namespace_resolver = kubecli.check_namespaces(watch_namespaces)
+        watch_namespaces = namespace_resolver.namespaces()
 
         # Cluster info
         logging.info("Fetching cluster info")
@@ -153,10 +375,19 @@ def main(cfg):
             logging.info("Publishing cerberus status at http://%s:%s" % (server_address, port))
             server.start_server(address)
 
-        dbcli.set_db_path(database_path)
+        dbcli.set_db_path(database_path, database_queue_size, database_flush_interval)
+        dbcli.set_retention(
+            database_retention.get("raw", 604800),
+            database_retention.get("minute_rollup", 2592000),
+            database_retention.get("hour_rollup", 0),
+            database_retention.get("prune_interval", 3600),
+        )
         if not os.path.isfile(database_path) or not reuse_database:
             dbcli.create_db()
             dbcli.create_table()
+        else:
+            dbcli.migrate()
+            dbcli.prune_db()
 
         # Create slack WebCleint when slack intergation has been enabled
         if slack_integration:
@@ -170,6 +401,7 @@ def main(cfg):
         # get list of all master nodes with provided labels in the config
         master_nodes = []
         master_label = ""
+        master_check_interval = watch_master_schedulable.get("check_interval", 10)
         if watch_master_schedulable["enabled"]:
             master_label = watch_master_schedulable["label"]
             nodes = kubecli.list_nodes(master_label)
@@ -183,16 +415,99 @@ def main(cfg):
                 master_nodes.extend(nodes)
 
         # Use cluster_info to get the api server url
-        api_server_url = kubecli.get_host() + "/healthz"
+        api_server_url = kubecli.get_host()
 
         # Counter for if api server is not ok
         api_fail_count = 0
 
-        # Variables used for multiprocessing
-        multiprocessing.set_start_method("fork")
-        pool = multiprocessing.Pool(int(cores_usage_percentage * multiprocessing.cpu_count()), init_worker)
-        manager = multiprocessing.Manager()
-        pods_tracker = manager.dict()
+        # Variables used for multiprocessing. The threads engine runs the checks on a pool of
+        # threads in this process, the kubernetes client calls are blocking but network bound,
+        # and shares plain dicts instead of forking workers and Manager proxies.
+        if execution_engine == "threads":
+            logging.info("Running the checks on a pool of %s threads" % (thread_concurrency))
+            pool = ThreadPool(thread_concurrency)
+            manager = engine.LocalManager()
+        else:
+            multiprocessing.set_start_method("fork")
+            pool = multiprocessing.Pool(int(cores_usage_percentage * multiprocessing.cpu_count()), init_worker)
+            manager = multiprocessing.Manager()
+
+        # Probe the API server in the background, between the iterations as well. Started
+        # after the workers are forked so that they do not inherit the probing thread.
+        apiserver_prober = kubecli.start_apiserver_prober(apiserver_probe_interval, apiserver_probe_timeout)
+
+        # Pod tracker state of each namespace, the restart count of its pods by uid, owned by
+        # this process. The workers get the state of their namespace and return the entries
+        # to update and the ones of the pods which are gone, which are merged here.
+        pods_tracker = {}
+
+        # Pods are served from an in-memory cache kept current by watches when the
+        # informer cache is enabled. The cache lives in this process, so the namespace
+        # checks read it directly instead of going through the pool workers.
+        namespace_starmap = pool.starmap
+        publish_status = publish_cerberus_status
+        status_watcher = None
+        if event_driven_status and not cerberus_publish_status:
+            logging.warning("The event driven status needs cerberus_publish_status to be enabled, ignoring it")
+            event_driven_status = False
+        if event_driven_status:
+            # The watch events are checked against the failure rules as they arrive and the
+            # status is published right away, coalesced with the results of the checks
+            logging.info("Publishing the status from the watch events of the pods, nodes and namespaces")
+            publisher = status_publisher.StatusPublisher(publish_cerberus_status, status_coalesce_interval)
+            publisher.start()
+            publish_status = functools.partial(publisher.set, "checks")
+            status_watcher = watcher.StatusWatcher(publisher, watch_namespaces)
+            if watch_nodes:
+                kubecli.start_node_informer(status_watcher.on_node, cmd_timeout)
+            if watch_terminating_namespaces:
+                kubecli.start_namespace_informer(status_watcher.on_namespace, cmd_timeout)
+        # Past cluster_wide_snapshot_threshold namespaces, the pods and the events are watched
+        # by a single cluster wide informer each instead of one per namespace
+        informers_cluster_wide = len(watch_namespaces) >= cluster_wide_snapshot_threshold
+        if pod_informer_cache or event_driven_status:
+            logging.info("Starting pod informers for the watched namespaces")
+            kubecli.start_pod_informers(
+                watch_namespaces,
+                cmd_timeout,
+                status_watcher.on_pod if status_watcher is not None else None,
+                informers_cluster_wide,
+            )
+            namespace_starmap = local_starmap
+
+        # The Warning events of the pods are watched and aggregated per pod and reason, the
+        # ones seen during an iteration are stored in the database at its end
+        event_aggregator = None
+        if watch_events.get("enabled", False):
+            logging.info("Watching the Warning events of the pods in the watched namespaces")
+            event_aggregator = events.EventAggregator(
+                watch_namespaces,
+                watch_events.get("reasons", ["BackOff", "OOMKilling", "FailedScheduling", "Unhealthy"]),
+                watch_events.get("max_entries", 1000),
+            )
+            kubecli.start_event_informers(
+                watch_namespaces, event_aggregator.on_event, cmd_timeout, informers_cluster_wide
+            )
+
+        # The CSR's are watched instead of listed at every iteration
+        if distribution == "openshift":
+            logging.info("Starting the CSR informer")
+            kubecli.start_csr_informer(cmd_timeout)
+
+        # The namespaces matching watch_namespaces are followed by a namespace watch, the
+        # ones created or deleted are added to or removed from the watched ones at the
+        # start of the next iteration
+        if watch_namespaces_rediscovery:
+            logging.info("Rediscovering the namespaces matching watch_namespaces during the run")
+            kubecli.start_namespace_informer(namespace_resolver.on_namespace, cmd_timeout)
+
+        # When the pod snapshot is shared, the pods are listed once per pass and the same
+        # listing feeds the readiness checks and the crash/restart tracker. The listing
+        # taken after the sleep is reused by the readiness checks of the next iteration.
+        snapshot = None
+        if shared_pod_snapshot:
+            snapshot = {"cluster_wide": len(watch_namespaces) >= cluster_wide_snapshot_threshold}
+            namespace_starmap = local_starmap
 
         # Track time taken for different checks in each iteration
         global time_tracker
@@ -204,10 +519,157 @@ def main(cfg):
         # Initialize the prometheus client
         promcli.initialize_prom_client(distribution, prometheus_url, prometheus_bearer_token)
 
-        # Prometheus query to alert on high apiserver latencies
-        apiserver_latency_query = r"""ALERTS{alertname="KubeAPILatencyHigh", severity="warning"}"""
-        # Prometheus query to alert when etcd fync duration is high
-        etcd_leader_changes_query = r"""ALERTS{alertname="etcdHighNumberOfLeaderChanges", severity="warning"}"""  # noqa
+        # Every check runs at its own cadence set by check_schedule, see check_settings.
+        # The latest result of each check is kept and the published status is recomputed
+        # from them, as soon as one of the checks changes it during the sleep. A check which
+        # misses its deadline is not waited for, its state is unknown until it completes.
+        # The iteration, its timings, the watched namespaces and the pods snapshot are
+        # passed to the checks from the scheduler state, kept current below.
+        def publish_check_status(healthy):
+            if cerberus_publish_status:
+                publish_status(healthy)
+
+        scheduler = engine_scheduler.Scheduler(pool, on_change=publish_check_status, timeout=check_timeout or None)
+        scheduler.state.update(watch_namespaces=watch_namespaces, pods_snapshot=None)
+        master_check_settings = check_settings(check_schedule, "master_schedulable")
+        if master_check_settings["interval"]:
+            master_check_interval = 1
+        scheduler.add(
+            "master_schedulable",
+            functools.partial(
+                kubecli.process_master_taint, master_label=master_label, check_interval=master_check_interval
+            ),
+            lambda result: True,
+            ([], master_nodes),
+            state=("iteration", "iter_track_time"),
+            previous=("master_nodes", 1),
+            **master_check_settings,
+        )
+        scheduler.add(
+            "nodes",
+            functools.partial(
+                kubecli.process_nodes,
+                watch_nodes=watch_nodes,
+                node_leases=node_health_from_leases,
+                conditions_refresh=node_conditions_refresh,
+            ),
+            lambda result: result[0],
+            (True, [], {}),
+            state=("iteration", "iter_track_time"),
+            previous=("node_tracker", 2),
+            **check_settings(check_schedule, "nodes"),
+        )
+        scheduler.add(
+            "cluster_operators",
+            functools.partial(kubecli.process_cluster_operator, distribution, watch_cluster_operators),
+            lambda result: result[0],
+            (True, []),
+            state=("iteration", "iter_track_time"),
+            **check_settings(check_schedule, "cluster_operators"),
+        )
+        scheduler.add(
+            "routes",
+            functools.partial(
+                kubecli.process_routes,
+                watch_url_routes,
+                concurrency=routes_concurrency,
+                connect_timeout=routes_connect_timeout,
+                read_timeout=routes_read_timeout,
+                latency_threshold=routes_latency_threshold,
+            ),
+            lambda result: not result[0],
+            ([], {}),
+            state=("iter_track_time",),
+            **check_settings(check_schedule, "routes"),
+        )
+        scheduler.add(
+            "terminating_namespaces",
+            functools.partial(
+                kubecli.monitor_namespaces_status, watch_terminating_namespaces=watch_terminating_namespaces
+            ),
+            lambda result: not result,
+            [],
+            state=("watch_namespaces", "iteration", "iter_track_time"),
+            **check_settings(check_schedule, "terminating_namespaces"),
+        )
+        # The CSR's are served from the cache of the CSR informer which lives in this process
+        scheduler.add(
+            "csrs",
+            functools.partial(kubecli.process_csrs, distribution),
+            lambda result: True,
+            [],
+            local=True,
+            state=("iter_track_time",),
+            **check_settings(check_schedule, "csrs"),
+        )
+        # The API server probes and the prometheus alerts are collected in this process
+        scheduler.add(
+            "apiserver",
+            apiserver_prober.collect,
+            lambda result: result[0],
+            (True, None),
+            local=True,
+            **check_settings(check_schedule, "apiserver"),
+        )
+        scheduler.add(
+            "prometheus_alerts",
+            promcli.process_prom_alerts,
+            lambda result: True,
+            local=True,
+            **check_settings(check_schedule, "prometheus_alerts"),
+        )
+        # The namespace checks are run from this process, either on the pool or against
+        # the pods cached or listed here, once per iteration
+        if workload_rollup:
+            logging.info("Checking the readiness of the workloads instead of the pods in the watched namespaces")
+            scheduler.add(
+                "namespaces",
+                functools.partial(process_workloads, namespace_starmap, manager, snapshot=snapshot),
+                lambda result: not result[0],
+                ({}, {}),
+                local=True,
+                timeout=check_settings(check_schedule, "namespaces")["timeout"],
+                state=("iteration", "watch_namespaces", "iter_track_time"),
+            )
+        else:
+            scheduler.add(
+                "namespaces",
+                functools.partial(process_namespaces, namespace_starmap, manager, snapshot=snapshot),
+                lambda result: not result[0],
+                ({}, {}),
+                local=True,
+                timeout=check_settings(check_schedule, "namespaces")["timeout"],
+                state=("iteration", "watch_namespaces", "iter_track_time", "pods_snapshot"),
+            )
+        # The pod tracker runs after the sleep, see below
+        scheduler.add(
+            "pod_tracker",
+            functools.partial(track_pods, namespace_starmap, pods_tracker=pods_tracker, snapshot=snapshot),
+            lambda result: True,
+            (None, [], []),
+            local=True,
+            manual=True,
+            timeout=check_settings(check_schedule, "pod_tracker")["timeout"],
+            state=("watch_namespaces",),
+        )
+        if custom_checks:
+            custom_checks_imports = []
+            for check in custom_checks:
+                my_check = ".".join(check.replace("/", ".").split(".")[:-1])
+                my_check_module = importlib.import_module(my_check)
+                custom_checks_imports.append(my_check_module)
+            scheduler.add(
+                "custom_checks",
+                functools.partial(process_custom_checks, custom_checks_imports),
+                lambda result: result[0],
+                (True, []),
+                local=True,
+                **check_settings(check_schedule, "custom_checks"),
+            )
+        # Time the pod tracker state was last merged, None until it is seeded, and the
+        # crashed/restarted pods found by the passes merged since they were last reported
+        pods_tracker_merged_time = None
+        crashed_restarted_pods = {}
 
         # Set the number of iterations to loop to infinity if daemon mode is
         # enabled or else set it to the provided iterations count in the config
@@ -232,6 +694,7 @@ def main(cfg):
                 iteration_start_time = time.time()
 
                 iteration += 1
+                scheduler.state.update(iteration=iteration, iter_track_time=iter_track_time)
 
                 # Read the config for info when slack integration is enabled
                 if slack_integration:
@@ -243,49 +706,61 @@ def main(cfg):
                     if iteration == 1:
                         slackcli.slack_report_cerberus_start(cv, weekday, watcher_slack_member_ID)
 
+                # Pick up the namespaces created or deleted since the previous iteration. The
+                # pod tracker state of the namespaces still watched is kept, the new ones are
+                # seeded by their first pass.
+                if watch_namespaces_rediscovery and namespace_resolver.namespaces() != watch_namespaces:
+                    active_namespaces = namespace_resolver.namespaces()
+                    added_namespaces = sorted(set(active_namespaces) - set(watch_namespaces))
+                    removed_namespaces = sorted(set(watch_namespaces) - set(active_namespaces))
+                    logging.info(
+                        "Iteration %s: Started watching the namespaces %s, stopped watching %s"
+                        % (iteration, added_namespaces, removed_namespaces)
+                    )
+                    watch_namespaces = active_namespaces
+                    scheduler.state["watch_namespaces"] = watch_namespaces
+                    kubecli.stop_informers(removed_namespaces)
+                    for namespace in removed_namespaces:
+                        pods_tracker.pop(namespace, None)
+                    if pod_informer_cache or event_driven_status:
+                        kubecli.start_pod_informers(
+                            added_namespaces,
+                            cmd_timeout,
+                            status_watcher.on_pod if status_watcher is not None else None,
+                            informers_cluster_wide,
+                        )
+                    if status_watcher is not None:
+                        status_watcher.set_namespaces(watch_namespaces)
+                    if event_aggregator is not None:
+                        event_aggregator.namespaces = set(watch_namespaces)
+                        kubecli.start_event_informers(
+                            added_namespaces, event_aggregator.on_event, cmd_timeout, informers_cluster_wide
+                        )
+
                 # Collect the initial creation_timestamp and restart_count of all the pods in all
                 # the namespaces in watch_namespaces
-                if iteration == 1:
-
-                    pool.starmap(
-                        kubecli.namespace_sleep_tracker,
-                        zip(watch_namespaces, repeat(pods_tracker), repeat(watch_namespaces_ignore_pattern)),
+                if pods_tracker_merged_time is None:
+                    pods_tracker_merged_time, scheduler.state["pods_snapshot"] = run_pod_tracker(
+                        scheduler, pods_tracker, pods_tracker_merged_time, crashed_restarted_pods
                     )
 
-                # Execute the functions to check api_server_status, master_schedulable_status,
-                # watch_nodes, watch_cluster_operators parallely
-                (
-                    (server_status),
-                    (schedulable_masters),
-                    (watch_nodes_status, failed_nodes),
-                    (watch_cluster_operators_status, failed_operators),
-                    (failed_routes),
-                    (terminating_namespaces),
-                ) = pool.map(
-                    smap,
-                    [
-                        functools.partial(kubecli.is_url_available, api_server_url),
-                        functools.partial(
-                            kubecli.process_master_taint, master_nodes, master_label, iteration, iter_track_time
-                        ),
-                        functools.partial(kubecli.process_nodes, watch_nodes, iteration, iter_track_time),
-                        functools.partial(
-                            kubecli.process_cluster_operator,
-                            distribution,
-                            watch_cluster_operators,
-                            iteration,
-                            iter_track_time,
-                        ),
-                        functools.partial(kubecli.process_routes, watch_url_routes, iter_track_time),
-                        functools.partial(
-                            kubecli.monitor_namespaces_status,
-                            watch_namespaces,
-                            watch_terminating_namespaces,
-                            iteration,
-                            iter_track_time,
-                        ),
-                    ],
-                )
+                # Run the checks that are due, the ones that are not keep their latest result.
+                # The checks still running when the iteration budget is spent are left behind
+                # with an unknown state so that the status is published on time.
+                iteration_deadline = None
+                if iteration_budget:
+                    iteration_deadline = iteration_start_time + iteration_budget
+                scheduler.run_iteration(iteration_deadline)
+                scheduler.state["pods_snapshot"] = None
+                master_nodes = scheduler.result("master_schedulable")[1]
+                watch_nodes_status = scheduler.healthy("nodes")
+                watch_cluster_operators_status = scheduler.healthy("cluster_operators")
+                server_status = scheduler.healthy("apiserver")
+                # The probes of all the collects since the previous iteration are reported
+                apiserver_report = None
+                if scheduler.fresh("apiserver"):
+                    apiserver_report = apiserver.merge_reports([result[1] for result in scheduler.results("apiserver")])
+                    apiserver.log_report(iteration, apiserver_report)
 
                 # Increment api_fail_count if api server url is not ok
                 if not server_status:
@@ -293,42 +768,28 @@ def main(cfg):
                 else:
                     api_fail_count = 0
 
-                # Initialize a shared_memory of type dict to share data between different processes
-                failed_pods_components = manager.dict()
-                failed_pod_containers = manager.dict()
-
-                # Monitor all the namespaces parallely
-                watch_namespaces_start_time = time.time()
-                pool.starmap(
-                    kubecli.process_namespace,
-                    zip(
-                        repeat(iteration),
-                        watch_namespaces,
-                        repeat(failed_pods_components),
-                        repeat(failed_pod_containers),
-                        repeat(watch_namespaces_ignore_pattern),
-                    ),
-                )
-
-                watch_namespaces_status = False if failed_pods_components else True
-                iter_track_time["watch_namespaces"] = time.time() - watch_namespaces_start_time
+                watch_namespaces_status = scheduler.healthy("namespaces")
 
                 # Check for the number of hits
                 if cerberus_publish_status:
                     logging.info("HTTP requests served: %s \n" % (server.SimpleHTTPRequestHandler.requests_served))
 
+                schedulable_masters = merge_failed(scheduler.results("master_schedulable"), 0)
                 if schedulable_masters:
                     logging.warning(
                         "Iteration %s: Masters without NoSchedule taint: %s\n" % (iteration, schedulable_masters)
                     )
 
-                # Logging the failed components
-                if not watch_nodes_status:
+                # Logging the failed components reported by the failing runs of the checks since
+                # the previous iteration, including the ones which recovered since
+                failed_nodes = merge_failed(scheduler.failures("nodes"), 1)
+                if failed_nodes:
                     logging.info("Iteration %s: Failed nodes" % (iteration))
                     logging.info("%s\n" % (failed_nodes))
                     dbcli.insert(datetime.now(), time.time(), 1, "not ready", failed_nodes, "node")
 
-                if not watch_cluster_operators_status and distribution == "openshift" and watch_cluster_operators:
+                failed_operators = merge_failed(scheduler.failures("cluster_operators"), 1)
+                if failed_operators and distribution == "openshift" and watch_cluster_operators:
                     logging.info("Iteration %s: Failed operators" % (iteration))
                     logging.info("%s\n" % (failed_operators))
                     dbcli.insert(datetime.now(), time.time(), 1, "degraded", failed_operators, "cluster operator")
@@ -341,20 +802,32 @@ def main(cfg):
                 elif distribution == "kubernetes" and inspect_components:
                     logging.info("Skipping the failed components inspection as " "it's specific to OpenShift")
 
-                if not server_status:
+                if apiserver_report is not None and apiserver_report["failures"]:
                     logging.info(
-                        "Iteration %s: Api Server is not healthy as reported by %s\n" % (iteration, api_server_url)
+                        "Iteration %s: Api Server is not healthy as reported by %s, %s of %s probes failed\n"
+                        % (iteration, api_server_url, apiserver_report["failures"], apiserver_report["probes"])
                     )
                     dbcli.insert(
-                        datetime.now(), time.time(), api_fail_count, "unavailable", list(api_server_url), "api server"
+                        datetime.now(),
+                        time.time(),
+                        api_fail_count,
+                        "unavailable",
+                        apiserver_report["failed_checks"] or [api_server_url],
+                        "api server",
                     )
 
-                if not watch_namespaces_status:
-                    logging.info("Iteration %s: Failed pods and components" % (iteration))
+                failed_pods_components, failed_pod_containers = merge_namespace_failures(
+                    scheduler.failures("namespaces")
+                )
+                if failed_pods_components:
+                    if workload_rollup:
+                        logging.info("Iteration %s: Degraded workloads and components" % (iteration))
+                    else:
+                        logging.info("Iteration %s: Failed pods and components" % (iteration))
                     for namespace, failures in failed_pods_components.items():
                         logging.info("%s: %s", namespace, failures)
 
-                        for pod, containers in failed_pod_containers[namespace].items():
+                        for pod, containers in failed_pod_containers.get(namespace, {}).items():
                             logging.info("Failed containers in %s: %s", pod, containers)
 
                         component = namespace.split("-")
@@ -362,89 +835,72 @@ def main(cfg):
                             component = "-".join(component[1:])
                         else:
                             component = "-".join(component)
-                        dbcli.insert(datetime.now(), time.time(), 1, "pod crash", failures, component)
+                        if workload_rollup:
+                            dbcli.insert(datetime.now(), time.time(), 1, "degraded", failures, component)
+                        else:
+                            dbcli.insert(datetime.now(), time.time(), 1, "pod crash", failures, component)
                     logging.info("")
 
-                watch_teminating_ns = True
+                terminating_namespaces = merge_failed(scheduler.failures("terminating_namespaces"))
                 if terminating_namespaces:
-                    watch_teminating_ns = False
                     logging.info("Iteration %s: Terminating namespaces %s" % (iteration, str(terminating_namespaces)))
 
                 # Logging the failed checking of routes
-                watch_routes_status = True
+                failed_routes = merge_failed(scheduler.failures("routes"), 0)
+                route_latencies = {}
+                for result in scheduler.failures("routes"):
+                    route_latencies.update(result[1])
                 if failed_routes:
-                    watch_routes_status = False
                     logging.info("Iteration %s: Failed route monitoring" % iteration)
                     for route in failed_routes:
-                        logging.info("Route url: %s" % route)
+                        logging.info("Route url: %s, latency: %.3fs" % (route, route_latencies[route]))
                     logging.info("")
                     dbcli.insert(datetime.now(), time.time(), 1, "unavailable", failed_routes, "route")
 
-                # Aggregate the status and publish it
-                cerberus_status = (
-                    watch_nodes_status
-                    and watch_namespaces_status
-                    and watch_cluster_operators_status
-                    and server_status
-                    and watch_routes_status
-                    and watch_teminating_ns
-                )
+                pending_csrs = merge_failed(scheduler.results("csrs"))
+                if pending_csrs:
+                    logging.warning("There are CSR's that are currently not approved")
+                    logging.warning("Csr's that are not approved: " + str(pending_csrs))
+                scheduler.reported()
 
-                if distribution == "openshift":
-                    watch_csrs_start_time = time.time()
-                    csrs = kubecli.get_csrs()
-                    pending_csr = []
-                    for csr in csrs["items"]:
-                        # find csr status
-                        if "conditions" in csr["status"]:
-                            if "Approved" not in csr["status"]["conditions"][0]["type"]:
-                                pending_csr.append(csr["metadata"]["name"])
-                        else:
-                            pending_csr.append(csr["metadata"]["name"])
-                    if pending_csr:
-                        logging.warning("There are CSR's that are currently not approved")
-                        logging.warning("Csr's that are not approved: " + str(pending_csr))
-                    iter_track_time["watch_csrs"] = time.time() - watch_csrs_start_time
+                unknown_checks = scheduler.unknown()
+                if unknown_checks:
+                    logging.warning(
+                        "Iteration %s: Checks which missed their deadline, their state is unknown: %s\n"
+                        % (iteration, unknown_checks)
+                    )
 
+                # Aggregate the latest status of each check and publish it
+                cerberus_status = scheduler.healthy()
+                if status_watcher is not None:
+                    watch_failures = status_watcher.failures()
+                    if watch_failures:
+                        logging.info("Iteration %s: Failures seen by the watches: %s\n" % (iteration, watch_failures))
                 if custom_checks:
-                    if iteration == 1:
-                        custom_checks_imports = []
-                        for check in custom_checks:
-                            my_check = ".".join(check.replace("/", ".").split(".")[:-1])
-                            my_check_module = importlib.import_module(my_check)
-                            custom_checks_imports.append(my_check_module)
-                    custom_checks_fail_messages = []
-                    custom_checks_status = True
-                    for check in custom_checks_imports:
-                        check_returns = check.main()
-                        if type(check_returns) == bool:
-                            custom_checks_status = custom_checks_status and check_returns
-                        elif type(check_returns) == dict:
-                            status = check_returns["status"]
-                            message = check_returns["message"]
-                            custom_checks_status = custom_checks_status and status
-                            custom_checks_fail_messages.append(message)
-                    cerberus_status = cerberus_status and custom_checks_status
+                    custom_checks_status, custom_checks_fail_messages = scheduler.result("custom_checks")
+                    custom_checks_status = scheduler.healthy("custom_checks") is not False
 
                 if cerberus_publish_status:
-                    publish_cerberus_status(cerberus_status)
+                    publish_status(cerberus_status)
+                if status_watcher is not None:
+                    cerberus_status = cerberus_status and status_watcher.healthy()
 
-                # Report failures in a slack channel
+                # Report failures in a slack channel, the checks in the unknown state are not
                 if (
-                    not watch_nodes_status
-                    or not watch_namespaces_status
-                    or not watch_cluster_operators_status
+                    watch_nodes_status is False
+                    or watch_namespaces_status is False
+                    or watch_cluster_operators_status is False
                     or not custom_checks_status
                 ):
                     if slack_integration:
                         slackcli.slack_logging(
                             cv,
                             iteration,
-                            watch_nodes_status,
+                            watch_nodes_status is not False,
                             failed_nodes,
-                            watch_cluster_operators_status,
+                            watch_cluster_operators_status is not False,
                             failed_operators,
-                            watch_namespaces_status,
+                            watch_namespaces_status is not False,
                             failed_pods_components,
                             custom_checks_status,
                             custom_checks_fail_messages,
@@ -459,42 +915,20 @@ def main(cfg):
                 elif distribution == "kubernetes" and inspect_components:
                     logging.info("Skipping the failed components inspection as " "it's specific to OpenShift")
 
-                # Alert on high latencies
-                metrics = promcli.process_prom_query(apiserver_latency_query)
-                if metrics:
-                    logging.warning(
-                        "Kubernetes API server latency is high. "
-                        "More than 99th percentile latency for given requests to the "
-                        "kube-apiserver is above 1 second.\n"
-                    )
-                    logging.info("%s\n" % (metrics))
-
-                # Alert on high etcd fync duration
-                metrics = promcli.process_prom_query(etcd_leader_changes_query)
-                if metrics:
-                    logging.warning(
-                        "Observed increase in number of etcd leader elections over the last "
-                        "15 minutes. Frequent elections may be a sign of insufficient resources, "
-                        "high network latency, or disruptions by other components and should be "
-                        "investigated.\n"
-                    )
-                logging.info("%s\n" % (metrics))
-
-                # Sleep for the specified duration
+                # Sleep for the specified duration, the checks with an interval keep running
+                # whenever they are due in the meantime
                 logging.info("Sleeping for the specified duration: %s\n" % (sleep_time))
-                time.sleep(float(sleep_time))
+                scheduler.run_for(float(sleep_time))
 
                 sleep_tracker_start_time = time.time()
 
-                # Track pod crashes/restarts during the sleep interval in all namespaces parallely
-                multiprocessed_output = pool.starmap(
-                    kubecli.namespace_sleep_tracker,
-                    zip(watch_namespaces, repeat(pods_tracker), repeat(watch_namespaces_ignore_pattern)),
-                )
-
-                crashed_restarted_pods = {}
-                for item in multiprocessed_output:
-                    crashed_restarted_pods.update(item)
+                # Track pod crashes/restarts during the sleep interval in all namespaces parallely.
+                # A pass which misses its deadline is merged once it completes, a failed one is
+                # not, the pods are then compared against the same state on the next pass.
+                if pods_tracker_merged_time is not None:
+                    pods_tracker_merged_time, scheduler.state["pods_snapshot"] = run_pod_tracker(
+                        scheduler, pods_tracker, pods_tracker_merged_time, crashed_restarted_pods
+                    )
 
                 iter_track_time["sleep_tracker"] = time.time() - sleep_tracker_start_time
 
@@ -513,9 +947,28 @@ def main(cfg):
                         for pod in pods:
                             if pod[1] == "crash":
                                 dbcli.insert(datetime.now(), time.time(), 1, "pod crash", [pod[0]], component)
-                            elif pod[1] == "restart":
+                            # The restarts are stored by the status watcher as they happen
+                            elif pod[1] == "restart" and not event_driven_status:
                                 dbcli.insert(datetime.now(), time.time(), pod[2], "pod restart", [pod[0]], component)
                     logging.info("")
+                    crashed_restarted_pods = {}
+
+                if event_aggregator is not None:
+                    pod_events = event_aggregator.flush()
+                    if pod_events:
+                        logging.info("Warning events of the pods during iteration %s" % (iteration))
+                        for namespace, pods in pod_events.items():
+                            for pod, reason, count, message in pods:
+                                logging.info("%s: %s %s %s times: %s" % (namespace, pod, reason, count, message))
+                                dbcli.insert(
+                                    datetime.now(),
+                                    time.time(),
+                                    count,
+                                    "pod " + reason,
+                                    [pod],
+                                    watcher.component(namespace),
+                                )
+                        logging.info("")
 
                 # Capture total time taken by the iteration
                 iter_track_time["entire_iteration"] = (time.time() - iteration_start_time) - sleep_time  # noqa
@@ -526,21 +979,25 @@ def main(cfg):
                 logging.info("-------------------------- Iteration Stats ---------------------------")  # noqa
                 for operation, timing in iter_track_time.items():
                     logging.info("Time taken to run %s in iteration %s: %s seconds" % (operation, iteration, timing))
+                for check, misses in scheduler.misses().items():
+                    logging.info("Deadlines missed by %s so far: %s" % (check, misses))
                 logging.info("----------------------------------------------------------------------\n")  # noqa
 
             except EndedByUserException:
                 pool.terminate()
                 pool.join()
+                dbcli.close()
                 logging.info("Terminating cerberus monitoring by user")
-                record_time(time_tracker)
+                record_time(time_tracker, scheduler.misses())
                 print_final_status_json(iteration, cerberus_status, 0)
                 sys.exit(0)
 
             except KeyboardInterrupt:
                 pool.terminate()
                 pool.join()
+                dbcli.close()
                 logging.info("Terminating cerberus monitoring")
-                record_time(time_tracker)
+                record_time(time_tracker, scheduler.misses())
                 print_final_status_json(iteration, cerberus_status, 1)
                 sys.exit(1)
 
@@ -548,16 +1005,18 @@ def main(cfg):
                 logging.info("Encountered issues in cluster. Hence, setting the go/no-go " "signal to false")
                 logging.info("Exception: %s\n" % (e))
                 if cerberus_publish_status:
-                    publish_cerberus_status(False)
+                    publish_status(False)
                     cerberus_status = False
 
                 continue
 
         else:
             logging.info("Completed watching for the specified number of iterations: %s" % (iterations))
-            record_time(time_tracker)
+            record_time(time_tracker, scheduler.misses())
+            scheduler.close()
             pool.close()
             pool.join()
+            dbcli.close()
             if cerberus_publish_status:
                 print_final_status_json(iterations, cerberus_status, 0)
                 sys.exit(0)